@@ -3,33 +3,188 @@
 YouTube Playlist Monitor - Main application
 """
 
-import schedule
+import os
+import queue
 import time
 import signal
 import sys
 import logging
+import json
 from datetime import datetime
+from typing import Callable, Dict, List, Optional
 
+# Only the lightweight modules are imported up front; yt-dlp, requests and
+# schedule are imported by the modes that use them (see setup())
 from src.config import Config
-from src.playlist_monitor import PlaylistMonitor
-from src.email_notifier import EmailNotifier
+
+# What each mode sets up before running
+MODE_COMPONENTS = {
+    'once': ('history', 'notifications', 'monitoring'),
+    'monitor': ('history', 'notifications', 'monitoring', 'scheduling'),
+    'test-email': ('notifier',),
+    'history': ('history',),
+}
+
+# Attributes holding what setup() creates, swapped as a whole on reload
+COMPONENT_ATTRIBUTES = ('history', 'notifier', 'outbox', 'digest', 'delivery',
+                        'verifier', 'monitors', 'engine', 'scheduler')
 
 class YouTubePlaylistMonitor:
     def __init__(self):
         self.config = Config()
-        self.monitor = PlaylistMonitor(self.config.playlist_url, self.config.state_file)
-        self.notifier = EmailNotifier(
-            self.config.resend_api_key,
-            self.config.from_email,
-            self.config.to_email
-        )
         self.logger = self._setup_logger()
         self.running = True
+        # Set by the signal handler; the main loop does the actual shutdown
+        self.stop_signal: Optional[int] = None
+        self.notifier = None
+        self.delivery = None
+        self.engine = None
+        self.verifier = None
+        self.scheduler = None
+        self.history = None
+        self.started_at = datetime.now()
+        self.checks = 0
+        self.last_check: Optional[Dict] = None
+        # Control commands waiting to run on the main loop, with their replies
+        self._commands = queue.Queue()
         
         # Set up signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
     
+    def setup(self, mode: str):
+        """Create the components a run mode needs, importing their dependencies"""
+        components = MODE_COMPONENTS[mode]
+        if 'history' in components:
+            self._setup_history()
+        if 'notifier' in components or 'notifications' in components:
+            self._setup_notifier()
+        if 'notifications' in components:
+            self._setup_notifications()
+        if 'monitoring' in components:
+            self._setup_monitoring()
+        if 'scheduling' in components:
+            self._setup_scheduling()
+    
+    def _setup_notifier(self):
+        from src.email_notifier import EmailNotifier
+        from src.transport import ResendTransport
+        
+        self.notifier = EmailNotifier(
+            self.config.resend_api_key,
+            self.config.from_email,
+            self.config.to_emails,
+            transport=ResendTransport(
+                self.config.resend_api_key,
+                api_url=self.config.resend_api_url,
+                pool_size=self.config.notify_pool_size,
+                connect_timeout=self.config.notify_connect_timeout_seconds,
+                read_timeout=self.config.notify_read_timeout_seconds
+            )
+        )
+    
+    def _setup_history(self):
+        self.history = None
+        if self.config.history_db:
+            from src.history import HistoryStore
+            self.history = HistoryStore(self.config.history_db, compress_after_days=self.config.history_compress_days)
+    
+    def _setup_notifications(self):
+        from src.delivery import NotificationQueue
+        from src.digest import DigestNotifier
+        from src.outbox import Outbox
+        
+        self.outbox = Outbox(
+            self.config.outbox_file,
+            retry_base_seconds=self.config.outbox_retry_base_seconds,
+            retry_max_seconds=self.config.outbox_retry_max_seconds
+        )
+        self.digest = DigestNotifier(
+            self.notifier,
+            window_seconds=self.config.digest_window_seconds,
+            recipients_for=self.config.recipients_for,
+            outbox=self.outbox,
+            history=self.history
+        )
+        self.delivery = NotificationQueue(
+            self.notifier,
+            max_size=self.config.notify_queue_size,
+            digest=self.digest
+        )
+    
+    def _setup_monitoring(self):
+        from src.multi_monitor import MultiPlaylistMonitor
+        from src.playlist_monitor import PlaylistMonitor
+        
+        self._configure_rate_limiter()
+        self.verifier = None
+        if self.config.verify_availability:
+            from src.verifier import AvailabilityVerifier
+            self.verifier = AvailabilityVerifier(
+                max_workers=self.config.verify_max_workers,
+                ttl_seconds=self.config.verify_cache_ttl_minutes * 60,
+                cache_file=self.config.verify_cache_file
+            )
+        self.monitors = [
+            PlaylistMonitor(
+                playlist_url,
+                self.config.state_file_for(playlist_url),
+                window_size=self.config.window_size,
+                session_ttl_seconds=self.config.session_ttl_minutes * 60,
+                scan_mode=self.config.scan_mode,
+                watermark_size=self.config.watermark_size,
+                full_rescan_hours=self.config.full_rescan_hours,
+                state_store=self._create_state_store(playlist_url),
+                outbox=self.outbox,
+                rules=self.config.rule_sets[playlist_url],
+                verifier=self.verifier,
+                history=self.history
+            )
+            for playlist_url in self.config.playlist_urls
+        ]
+        self.engine = MultiPlaylistMonitor(self.monitors, max_workers=self.config.max_workers)
+    
+    def _configure_rate_limiter(self):
+        from src.throttle import rate_limiter
+        
+        # Shared by the playlist and verification sessions of every monitor
+        rate_limiter.configure(
+            rate_per_second=self.config.fetch_rate_per_second,
+            burst=self.config.fetch_burst,
+            host_rates=self.config.fetch_host_rates,
+            backoff_seconds=self.config.fetch_backoff_seconds,
+            max_backoff_seconds=self.config.fetch_max_backoff_seconds,
+            max_wait_seconds=self.config.fetch_max_wait_seconds
+        )
+    
+    def _setup_scheduling(self):
+        self.scheduler = None
+        if self.config.schedule_mode == 'adaptive':
+            from src.scheduler import AdaptiveScheduler
+            self.scheduler = AdaptiveScheduler(
+                self.config.detection_history_file,
+                base_interval_minutes=self.config.monitor_interval_minutes,
+                min_interval_minutes=self.config.min_interval_minutes,
+                max_interval_minutes=self.config.max_interval_minutes
+            )
+    
+    def _create_state_store(self, playlist_url: str):
+        """Create the configured state backend for a playlist"""
+        from src.state_store import JournalStateStore, JsonStateStore, SqliteStateStore
+        
+        state_file = self.config.state_file_for(playlist_url)
+        if self.config.state_backend == 'sqlite':
+            # All playlists share one database; the old JSON file is migrated on first load
+            return SqliteStateStore(
+                self.config.state_db,
+                self.config.playlist_key(playlist_url),
+                legacy_json_file=state_file
+            )
+        if self.config.state_backend == 'journal':
+            # Reads the existing JSON file as its initial snapshot
+            return JournalStateStore(state_file, compact_bytes=self.config.journal_compact_kb * 1024)
+        return JsonStateStore(state_file)
+    
     def _setup_logger(self) -> logging.Logger:
         """Set up main application logger"""
         logger = logging.getLogger("youtube_monitor")
@@ -55,68 +210,324 @@ class YouTubePlaylistMonitor:
         return logger
     
     def _signal_handler(self, signum, frame):
-        """Handle shutdown signals gracefully"""
-        self.logger.info(f"Received signal {signum}, shutting down gracefully...")
+        """Ask the main loop to stop; draining happens there, outside the handler"""
+        # The interrupted code may hold the digest or outbox locks, so nothing here may block
+        self.stop_signal = signum
         self.running = False
     
-    def monitor_and_notify(self):
-        """Perform one monitoring cycle with notifications"""
+    def monitor_and_notify(self) -> int:
+        """Perform one monitoring cycle with notifications, returning the number of changes"""
         self.logger.info("🔍 Starting monitoring cycle")
         
+        start = time.monotonic()
+        total_changes = 0
         try:
-            # Monitor for changes
-            changes = self.monitor.monitor_once()
+            # Monitor all playlists for changes concurrently
+            results = self.engine.monitor_all()
             
-            if changes:
-                self.logger.info(f"🎉 Found {len(changes)} video(s) that became free!")
-                
-                # Send notifications
-                success = self.notifier.send_notification(changes)
-                if success:
-                    self.logger.info("📧 Notification sent successfully")
-                else:
-                    self.logger.error("❌ Failed to send notification")
-            else:
+            # Coalesced into one digest per recipient
+            for playlist_url, changes in results.items():
+                if changes:
+                    self.logger.info(f"🎉 Found {len(changes)} video(s) that became free in {playlist_url}")
+                    
+                    # Delivered by the background worker so a slow send can't delay the next fetch
+                    self.delivery.enqueue(changes, playlist_url)
+            
+            if not any(results.values()):
                 self.logger.info("📊 No changes detected")
+            
+            detected_at = [change['detected_at'] for changes in results.values() for change in changes]
+            total_changes = len(detected_at)
+            if self.scheduler:
+                self.scheduler.record_detections(detected_at)
                 
         except Exception as e:
             self.logger.error(f"❌ Error during monitoring cycle: {e}")
+        
+        self.checks += 1
+        self.last_check = {
+            'at': datetime.now().isoformat(),
+            'changes': total_changes,
+            'seconds': round(time.monotonic() - start, 3),
+        }
+        return total_changes
+    
+    def _run_adaptive_cycle(self):
+        """Run one cycle, then schedule the next one at the adaptive interval"""
+        import schedule
+        
+        found_changes = self.monitor_and_notify() > 0
+        interval = self.scheduler.next_interval(found_changes)
+        schedule.every(max(1, round(interval * 60))).seconds.do(self._run_adaptive_cycle)
+        return schedule.CancelJob
     
     def run_scheduled(self):
         """Run the monitor with scheduling"""
+        import schedule
+        from src.metrics import start_metrics_server
+        
+        self.setup('monitor')
         self.logger.info("🚀 Starting YouTube Playlist Monitor")
-        self.logger.info(f"📋 Monitoring playlist every {self.config.monitor_interval_minutes} minutes")
-        self.logger.info(f"📧 Notifications will be sent to: {self.config.to_email}")
+        self.logger.info(
+            f"📋 Monitoring {len(self.monitors)} playlist(s) every {self.config.monitor_interval_minutes} minutes"
+            + (f" (adaptive, {self.config.min_interval_minutes:g}-{self.config.max_interval_minutes:g} min)"
+               if self.scheduler else "")
+        )
+        self.logger.info(f"📧 Notifications will be sent to: {', '.join(self.config.to_emails)}")
+        if self.config.digest_window_seconds:
+            self.logger.info(f"📨 Changes are coalesced into digests every {self.config.digest_window_seconds:g} seconds")
         
-        # Schedule monitoring
-        schedule.every(self.config.monitor_interval_minutes).minutes.do(self.monitor_and_notify)
+        # Expose metrics for scraping while running continuously
+        metrics_server = None
+        if self.config.metrics_port:
+            try:
+                metrics_server = start_metrics_server(self.config.metrics_port, self.config.metrics_host)
+                self.logger.info(
+                    f"📈 Metrics available at http://{self.config.metrics_host}:{self.config.metrics_port}/metrics"
+                )
+            except OSError as e:
+                self.logger.error(f"❌ Could not start metrics server: {e}")
         
-        # Run initial check
+        # Run initial check, then schedule monitoring
         self.logger.info("🔍 Running initial monitoring check")
-        self.monitor_and_notify()
+        self._schedule_cycles(run_now=True)
         
         # Main loop
         while self.running:
             try:
                 schedule.run_pending()
-                time.sleep(1)
+                # Waits for a control command instead of sleeping
+                self._run_commands(timeout=1)
             except KeyboardInterrupt:
                 break
             except Exception as e:
                 self.logger.error(f"❌ Unexpected error: {e}")
                 time.sleep(60)  # Wait a minute before continuing
         
+        if self.stop_signal is not None:
+            self.logger.info(f"Received signal {self.stop_signal}, shutting down gracefully...")
+        self._close_components()
+        if metrics_server:
+            metrics_server.shutdown()
         self.logger.info("👋 Monitor stopped")
     
-    def run_once(self):
-        """Run the monitor once and exit"""
+    def _schedule_cycles(self, run_now: bool):
+        """(Re)schedule monitoring cycles at the configured interval"""
+        import schedule
+        
+        schedule.clear()
+        if self.scheduler:
+            # Each adaptive cycle schedules the next one
+            if run_now:
+                self._run_adaptive_cycle()
+            else:
+                schedule.every(self.config.monitor_interval_minutes).minutes.do(self._run_adaptive_cycle)
+        else:
+            schedule.every(self.config.monitor_interval_minutes).minutes.do(self.monitor_and_notify)
+            if run_now:
+                self.monitor_and_notify()
+    
+    def _components(self) -> Dict:
+        return {name: getattr(self, name, None) for name in COMPONENT_ATTRIBUTES}
+    
+    def _close_components(self, components: Optional[Dict] = None):
+        """Stop monitoring, waiting for queued notifications to be delivered"""
+        components = components or self._components()
+        if components['engine']:
+            components['engine'].close()
+        if components['verifier']:
+            components['verifier'].close()
+        if components['delivery']:
+            components['delivery'].close(timeout=self.config.notify_drain_timeout_seconds)
+        if components['notifier']:
+            components['notifier'].close()
+        # After delivery, which records the alerts it sends
+        if components['history']:
+            components['history'].close()
+    
+    def _run_commands(self, timeout: float):
+        """Run the next control command handed to the main loop, if one arrives in time"""
+        try:
+            handler, reply = self._commands.get(timeout=timeout)
+        except queue.Empty:
+            return
+        try:
+            reply.set_result(handler())
+        except Exception as e:
+            reply.set_exception(e)
+    
+    def _in_main_loop(self, handler: Callable[[], Dict]) -> Callable[[], Dict]:
+        """Wrap a control handler so it runs on the main loop, never during a cycle"""
+        from concurrent.futures import Future
+        
+        def run() -> Dict:
+            reply = Future()
+            self._commands.put((handler, reply))
+            return reply.result()
+        return run
+    
+    def _check_command(self) -> Dict:
+        changes = self.monitor_and_notify()
+        return {'ok': True, 'changes': changes, 'seconds': self.last_check['seconds']}
+    
+    def _status_command(self) -> Dict:
+        import schedule
+        from src.throttle import rate_limiter
+        
+        next_run = schedule.next_run()
+        return {
+            'ok': True,
+            'pid': os.getpid(),
+            'started_at': self.started_at.isoformat(),
+            'playlists': self.config.playlist_urls,
+            'checks': self.checks,
+            'last_check': self.last_check,
+            'next_check_at': next_run.isoformat() if next_run else None,
+            'pending_notifications': self.outbox.pending_count(),
+            'throttle': rate_limiter.snapshot(),
+        }
+    
+    def _reload_command(self) -> Dict:
+        # A broken .env is reported back and the running configuration kept
+        config = Config.reload(self.config.env_file)
+        previous, previous_config = self._components(), self.config
+        self.config = config
+        try:
+            self.setup('monitor')
+        except Exception:
+            # Keep monitoring with the old components; drop what was already built
+            built = self._components()
+            self.config = previous_config
+            for name, component in previous.items():
+                setattr(self, name, component)
+            self._configure_rate_limiter()
+            self._close_components({name: component if component is not previous[name] else None
+                                    for name, component in built.items()})
+            raise
+        self._close_components(previous)
+        self._schedule_cycles(run_now=False)
+        self.logger.info(f"🔄 Configuration reloaded: monitoring {len(self.monitors)} playlist(s)")
+        return {'ok': True, 'playlists': self.config.playlist_urls}
+    
+    def run_daemon(self):
+        """Run the monitor resident, taking commands over the control socket"""
+        from src.control import ControlServer
+        
+        if not self.config.control_socket:
+            raise ValueError("CONTROL_SOCKET must be set to run as a daemon")
+        
+        control = ControlServer(self.config.control_socket, {
+            'check': self._in_main_loop(self._check_command),
+            'reload': self._in_main_loop(self._reload_command),
+            'status': self._status_command,
+        })
+        control.start()
+        try:
+            self.run_scheduled()
+        finally:
+            control.close()
+            # Commands that arrived during shutdown won't run
+            while not self._commands.empty():
+                _, reply = self._commands.get_nowait()
+                reply.set_exception(RuntimeError("The daemon stopped"))
+    
+    def send_command(self, command: str) -> Optional[Dict]:
+        """Send a command to a running daemon; None when none is reachable"""
+        if not self.config.control_socket:
+            return None
+        from src.control import send_command
+        
+        return send_command(self.config.control_socket, command, timeout=self.config.control_timeout_seconds)
+    
+    def run_once(self, local: bool = False):
+        """Run the monitor once and exit, letting a running daemon do the check if there is one"""
+        reply = None if local else self.send_command('check')
+        if reply is not None:
+            if reply.get('ok'):
+                self.logger.info(f"🔌 Daemon checked in {reply['seconds']:.2f}s and found {reply['changes']} change(s)")
+            else:
+                self.logger.error(f"❌ Daemon check failed: {reply.get('error')}")
+            return
+        
+        self.setup('once')
         self.logger.info("🔍 Running single monitoring check")
         self.monitor_and_notify()
+        # Waits for queued notifications before the process exits
+        self._close_components()
+        self._dump_metrics()
+    
+    def _dump_metrics(self):
+        """Log the per-stage metrics summary and write it to the metrics file"""
+        from src.metrics import metrics
+        
+        summary = metrics.to_dict()
+        self.logger.info(f"📈 Metrics: {json.dumps(summary['stages'])}")
+        if self.config.metrics_file:
+            try:
+                metrics.write_json(self.config.metrics_file)
+            except OSError as e:
+                self.logger.error(f"❌ Could not write metrics file: {e}")
+    
+    def show_history(self, video_id: Optional[str] = None, days: float = 30):
+        """Print a video's timeline, or statistics of the last `days` days"""
+        self.setup('history')
+        if not self.history:
+            raise ValueError("HISTORY_DB must be set to query the history")
+        
+        try:
+            if video_id:
+                self._print_timeline(video_id, self.history.timeline(video_id))
+            else:
+                self._print_stats(days, self.history.stats(time.time() - days * 86400))
+        finally:
+            self.history.close()
+    
+    @staticmethod
+    def _print_timeline(video_id: str, events: List[Dict]):
+        def when(timestamp: float) -> str:
+            return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+        
+        if not events:
+            print(f"📭 Nothing recorded for video {video_id}")
+            return
+        
+        print(f"📼 Timeline of {video_id}: {events[-1].get('title') or events[0].get('title')}")
+        for event in events:
+            if event['event'] == 'observed':
+                until = f"still, last seen {when(event['until'])}" if event['ongoing'] else f"until {when(event['until'])}"
+                print(f"  {when(event['at'])}  👁️  {event['status']} {until}")
+            elif event['event'] == 'alert':
+                print(f"  {when(event['at'])}  📧 {event['type']} emailed to {event['recipients']} recipient(s)")
+            else:
+                detail = f" ({event['detail']})" if event['detail'] else ""
+                print(f"  {when(event['at'])}  🔀 {event['event']}: "
+                      f"{event['previous_status']} → {event['status']}{detail}")
+    
+    @staticmethod
+    def _print_stats(days: float, stats: Dict):
+        def hours(value: Optional[float]) -> str:
+            return '-' if value is None else f"{value:.1f}h"
+        
+        since = datetime.fromtimestamp(stats['since']).strftime('%Y-%m-%d %H:%M')
+        print(f"📊 History of the last {days:g} day(s) (since {since})")
+        print(f"  Checks: {stats['checks']} across {stats['playlists']} playlist(s)")
+        transitions = ', '.join(f"{count} {kind}" for kind, count in sorted(stats['transitions'].items()))
+        print(f"  Transitions: {transitions or 'none'}")
+        print(f"  Alerts: {stats['alerts']} change(s) emailed, {stats['emails']} email(s) in total")
+        print(f"  Free spells: {stats['free_spells']} ended (average {hours(stats['avg_free_hours'])}, "
+              f"median {hours(stats['median_free_hours'])}), {stats['still_free']} still free")
+        if stats['freed_by_hour']:
+            most = max(stats['freed_by_hour'].values())
+            print("  Became free by hour of day:")
+            for hour, count in stats['freed_by_hour'].items():
+                print(f"    {hour:02d}:00 {'█' * max(1, round(count / most * 30))} {count}")
     
     def test_email(self):
         """Test email notification system"""
+        self.setup('test-email')
         self.logger.info("📧 Testing email notification system")
         success = self.notifier.send_test_notification()
+        self.notifier.close()
         if success:
             self.logger.info("✅ Test email sent successfully!")
             return True
@@ -131,9 +542,26 @@ def main():
     parser = argparse.ArgumentParser(description="YouTube Playlist Monitor")
     parser.add_argument(
         '--mode', 
-        choices=['once', 'monitor', 'test-email'], 
+        choices=['once', 'monitor', 'daemon', 'status', 'reload', 'history', 'test-email'], 
         default='once',
-        help='Run mode: once (single check - default), monitor (continuous), test-email (test notifications)'
+        help='Run mode: once (single check - default), monitor (continuous), daemon (continuous, '
+             'controlled over CONTROL_SOCKET), status/reload (send to a running daemon), '
+             'history (query the recorded timeline), test-email (test notifications)'
+    )
+    parser.add_argument(
+        '--local',
+        action='store_true',
+        help='With --mode once, check in this process even when a daemon is running'
+    )
+    parser.add_argument(
+        '--video',
+        help='With --mode history, show the timeline of this video id instead of statistics'
+    )
+    parser.add_argument(
+        '--days',
+        type=float,
+        default=30,
+        help='With --mode history, how many days back the statistics cover (default 30)'
     )
     
     args = parser.parse_args()
@@ -142,9 +570,20 @@ def main():
         app = YouTubePlaylistMonitor()
         
         if args.mode == 'once':
-            app.run_once()
+            app.run_once(local=args.local)
         elif args.mode == 'monitor':
             app.run_scheduled()
+        elif args.mode == 'daemon':
+            app.run_daemon()
+        elif args.mode in ('status', 'reload'):
+            reply = app.send_command(args.mode)
+            if reply is None:
+                print(f"❌ Daemon not reachable on {app.config.control_socket or '(CONTROL_SOCKET unset)'}")
+                sys.exit(1)
+            print(json.dumps(reply, indent=2, ensure_ascii=False))
+            sys.exit(0 if reply.get('ok') else 1)
+        elif args.mode == 'history':
+            app.show_history(args.video, args.days)
         elif args.mode == 'test-email':
             success = app.test_email()
             sys.exit(0 if success else 1)
@@ -3,13 +3,21 @@
 Configuration management for YouTube Playlist Monitor
 """
 
+import json
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .rules import DEFAULT_FREE_RULES, RuleSet, parse_rules
+
+# The process environment before any .env file was applied to it
+_PROCESS_ENVIRON = dict(os.environ)
 
 class Config:
     def __init__(self, env_file: str = ".env"):
         """Load configuration from environment variables"""
+        self.env_file = env_file
         load_dotenv(env_file)
         
         # Required settings
@@ -22,11 +30,82 @@ class Config:
             'PLAYLIST_URL', 
             'https://www.youtube.com/playlist?list=PLO_DkCSmTKMNMgr-JKMDV2Sw2HW59LMvc'
         )
+        # Comma-separated list of playlists; falls back to PLAYLIST_URL
+        self.playlist_urls = self._unique_playlists([
+            url.strip() for url in os.getenv('PLAYLIST_URLS', '').split(',') if url.strip()
+        ]) or [self.playlist_url]
         self.monitor_interval_minutes = int(os.getenv('MONITOR_INTERVAL_MINUTES', '30'))
+        # fixed: every MONITOR_INTERVAL_MINUTES; adaptive: learn from past detections
+        self.schedule_mode = os.getenv('SCHEDULE_MODE', 'fixed')
+        self.min_interval_minutes = float(os.getenv('SCHEDULE_MIN_INTERVAL_MINUTES', '5'))
+        self.max_interval_minutes = float(os.getenv('SCHEDULE_MAX_INTERVAL_MINUTES', '120'))
+        self.detection_history_file = os.getenv('DETECTION_HISTORY_FILE', 'detection_history.json')
+        self.window_size = int(os.getenv('MONITOR_WINDOW_SIZE', '3'))
+        self.max_workers = int(os.getenv('MONITOR_MAX_WORKERS', '4'))
+        self.session_ttl_minutes = int(os.getenv('YTDLP_SESSION_TTL_MINUTES', '60'))
+        self.scan_mode = os.getenv('SCAN_MODE', 'head')
+        self.watermark_size = int(os.getenv('WATERMARK_SIZE', '10'))
+        self.full_rescan_hours = float(os.getenv('FULL_RESCAN_HOURS', '24'))
         self.state_file = os.getenv('STATE_FILE', 'playlist_state.json')
+        self.state_backend = os.getenv('STATE_BACKEND', 'json')
+        self.state_db = os.getenv('STATE_DB', 'playlist_state.db')
+        self.journal_compact_kb = int(os.getenv('JOURNAL_COMPACT_KB', '256'))
+        # Timeline of observations, transitions and alerts (empty disables it)
+        self.history_db = os.getenv('HISTORY_DB')
+        self.history_compress_days = float(os.getenv('HISTORY_COMPRESS_DAYS', '90'))
+        
+        # Title rules deciding which videos are free; RULES_FILE overrides them per playlist
+        self.free_rules = parse_rules(os.getenv('FREE_RULES', '')) or list(DEFAULT_FREE_RULES)
+        self.rules_file = os.getenv('RULES_FILE')
+        
+        # Optionally confirm title-based transitions by fully extracting those videos
+        self.verify_availability = os.getenv('VERIFY_AVAILABILITY', 'false').lower() in ('1', 'true', 'yes')
+        self.verify_max_workers = int(os.getenv('VERIFY_MAX_WORKERS', '4'))
+        self.verify_cache_ttl_minutes = float(os.getenv('VERIFY_CACHE_TTL_MINUTES', '360'))
+        self.verify_cache_file = os.getenv('VERIFY_CACHE_FILE', 'verification_cache.json')
+        
+        # Shared per-host rate limit of every yt-dlp request, backing off when throttled
+        self.fetch_rate_per_second = float(os.getenv('FETCH_RATE_PER_SECOND', '2'))
+        self.fetch_burst = float(os.getenv('FETCH_BURST', '10'))
+        self.fetch_host_rates = self._parse_host_rates(os.getenv('FETCH_HOST_RATES', ''))
+        self.fetch_backoff_seconds = float(os.getenv('FETCH_BACKOFF_SECONDS', '30'))
+        self.fetch_max_backoff_seconds = float(os.getenv('FETCH_MAX_BACKOFF_SECONDS', '900'))
+        self.fetch_max_wait_seconds = float(os.getenv('FETCH_MAX_WAIT_SECONDS', '60'))
+        
+        # Extra recipients per playlist: "<list id>:a@example.com,b@example.com;<list id>:..."
+        self.playlist_recipients = self._parse_playlist_recipients(os.getenv('PLAYLIST_RECIPIENTS', ''))
+        # Changes arriving within this many seconds are sent as one digest per recipient
+        self.digest_window_seconds = float(os.getenv('DIGEST_WINDOW_SECONDS', '0'))
+        
+        # Changes are kept here until delivered; failed sends are retried with backoff
+        self.outbox_file = os.getenv('OUTBOX_FILE', 'notification_outbox.json')
+        self.outbox_retry_base_seconds = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '60'))
+        self.outbox_retry_max_seconds = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '3600'))
+        
+        # Pooled HTTP connection to the email API (RESEND_API_URL can point at a local stand-in)
+        self.resend_api_url = os.getenv('RESEND_API_URL', 'https://api.resend.com')
+        self.notify_pool_size = int(os.getenv('NOTIFY_POOL_SIZE', '10'))
+        self.notify_connect_timeout_seconds = float(os.getenv('NOTIFY_CONNECT_TIMEOUT_SECONDS', '5'))
+        self.notify_read_timeout_seconds = float(os.getenv('NOTIFY_READ_TIMEOUT_SECONDS', '30'))
+        
+        # Notification delivery queue
+        self.notify_queue_size = int(os.getenv('NOTIFY_QUEUE_SIZE', '100'))
+        self.notify_drain_timeout_seconds = float(os.getenv('NOTIFY_DRAIN_TIMEOUT_SECONDS', '30'))
+        
+        # Metrics: HTTP endpoint in monitor mode (0 disables), JSON summary in once mode
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        self.metrics_port = int(os.getenv('METRICS_PORT', '9108'))
+        self.metrics_file = os.getenv('METRICS_FILE', 'metrics.json')
+        
+        # Daemon control socket; `once` forwards its check to a daemon listening here
+        self.control_socket = os.getenv('CONTROL_SOCKET', 'monitor.sock')
+        self.control_timeout_seconds = float(os.getenv('CONTROL_TIMEOUT_SECONDS', '300'))
         
         # Validate required settings
         self._validate()
+        
+        # Compile each playlist's rules once, up front
+        self.rule_sets = self._compile_rule_sets()
     
     def _validate(self):
         """Validate that required configuration is present"""
@@ -43,6 +122,156 @@ class Config:
                 f"Missing required configuration: {', '.join(missing_fields)}\n"
                 f"Please set these in your .env file or environment variables."
             )
+        
+        if self.window_size < 1:
+            raise ValueError("MONITOR_WINDOW_SIZE must be at least 1")
+        
+        if self.max_workers < 1:
+            raise ValueError("MONITOR_MAX_WORKERS must be at least 1")
+        
+        if self.scan_mode not in ('head', 'incremental', 'full'):
+            raise ValueError("SCAN_MODE must be 'head', 'incremental' or 'full'")
+        
+        if self.schedule_mode not in ('fixed', 'adaptive'):
+            raise ValueError("SCHEDULE_MODE must be 'fixed' or 'adaptive'")
+        
+        if not 0 < self.min_interval_minutes <= self.max_interval_minutes:
+            raise ValueError("SCHEDULE_MIN_INTERVAL_MINUTES must be positive and not above SCHEDULE_MAX_INTERVAL_MINUTES")
+        
+        if self.state_backend not in ('json', 'sqlite', 'journal'):
+            raise ValueError("STATE_BACKEND must be 'json', 'sqlite' or 'journal'")
+        
+        if self.history_compress_days <= 0:
+            raise ValueError("HISTORY_COMPRESS_DAYS must be positive")
+        
+        if not 0 < self.outbox_retry_base_seconds <= self.outbox_retry_max_seconds:
+            raise ValueError("OUTBOX_RETRY_BASE_SECONDS must be positive and not above OUTBOX_RETRY_MAX_SECONDS")
+        
+        if self.fetch_rate_per_second <= 0 or any(rate <= 0 for rate in self.fetch_host_rates.values()):
+            raise ValueError("FETCH_RATE_PER_SECOND and FETCH_HOST_RATES must be positive")
+        
+        if self.fetch_burst < 1:
+            raise ValueError("FETCH_BURST must be at least 1")
+        
+        if not 0 < self.fetch_backoff_seconds <= self.fetch_max_backoff_seconds:
+            raise ValueError("FETCH_BACKOFF_SECONDS must be positive and not above FETCH_MAX_BACKOFF_SECONDS")
+        
+        if self.verify_max_workers < 1:
+            raise ValueError("VERIFY_MAX_WORKERS must be at least 1")
+        
+        if self.notify_pool_size < 1:
+            raise ValueError("NOTIFY_POOL_SIZE must be at least 1")
+        
+        if self.digest_window_seconds < 0:
+            raise ValueError("DIGEST_WINDOW_SECONDS must not be negative")
+        
+        if self.control_timeout_seconds <= 0:
+            raise ValueError("CONTROL_TIMEOUT_SECONDS must be positive")
+    
+    @classmethod
+    def reload(cls, env_file: str = ".env") -> 'Config':
+        """Re-read the .env file, as if the process had just started"""
+        # Values loaded from the previous .env would otherwise shadow edits to it
+        for key in set(os.environ) - set(_PROCESS_ENVIRON):
+            del os.environ[key]
+        os.environ.update(_PROCESS_ENVIRON)
+        return cls(env_file)
+    
+    def _compile_rule_sets(self) -> Dict[str, RuleSet]:
+        """Build the rule set of every monitored playlist"""
+        playlist_rules = {}
+        if self.rules_file:
+            try:
+                with open(self.rules_file, 'r') as f:
+                    playlist_rules = json.load(f)
+            except (OSError, ValueError) as e:
+                raise ValueError(f"Could not read RULES_FILE {self.rules_file}: {e}")
+            if not isinstance(playlist_rules, dict):
+                raise ValueError(f"RULES_FILE {self.rules_file} must map playlist list ids to lists of rules")
+        
+        for key, rules in playlist_rules.items():
+            if (not isinstance(rules, list) or not rules
+                    or not all(isinstance(rule, str) and rule.strip() for rule in rules)):
+                raise ValueError(f"RULES_FILE rules for {key} must be a non-empty list of non-empty strings, "
+                                 f"got {json.dumps(rules, ensure_ascii=False)}")
+        
+        default = RuleSet(self.free_rules)
+        rule_sets = {}
+        for url in self.playlist_urls:
+            key = self.playlist_key(url)
+            if key not in playlist_rules:
+                rule_sets[url] = default
+                continue
+            try:
+                rule_sets[url] = RuleSet(playlist_rules[key])
+            except ValueError as e:
+                raise ValueError(f"RULES_FILE rules for {key}: {e}")
+        return rule_sets
+    
+    @staticmethod
+    def _unique_playlists(urls: List[str]) -> List[str]:
+        """Drop playlists listed more than once (by URL or list id), keeping the first in order"""
+        unique, seen = [], set()
+        for url in urls:
+            key = parse_qs(urlparse(url).query).get('list', [url])[0]
+            if key not in seen:
+                seen.add(key)
+                unique.append(url)
+        return unique
+    
+    def _parse_playlist_recipients(self, value: str) -> Dict[str, List[str]]:
+        """Parse PLAYLIST_RECIPIENTS into a map of playlist key to addresses"""
+        recipients = {}
+        for entry in value.split(';'):
+            if not entry.strip():
+                continue
+            key, sep, addresses = entry.partition(':')
+            if not sep:
+                raise ValueError(f"PLAYLIST_RECIPIENTS entry must look like '<list id>:<emails>': {entry.strip()}")
+            recipients[key.strip()] = [a.strip() for a in addresses.split(',') if a.strip()]
+        return recipients
+    
+    def _parse_host_rates(self, value: str) -> Dict[str, float]:
+        """Parse FETCH_HOST_RATES into a map of host to requests per second"""
+        rates = {}
+        for entry in value.split(','):
+            if not entry.strip():
+                continue
+            host, sep, rate = entry.partition('=')
+            try:
+                rates[host.strip().lower()] = float(rate)
+            except ValueError:
+                sep = ''
+            if not sep or not host.strip():
+                raise ValueError(f"FETCH_HOST_RATES entry must look like '<host>=<requests per second>': {entry.strip()}")
+        return rates
+    
+    @property
+    def to_emails(self) -> List[str]:
+        """All addresses in TO_EMAIL"""
+        return [address.strip() for address in (self.to_email or '').split(',') if address.strip()]
+    
+    def recipients_for(self, playlist_url: Optional[str]) -> List[str]:
+        """Get everyone to notify about a playlist: TO_EMAIL plus its own recipients"""
+        recipients = list(self.to_emails)
+        if playlist_url in self.playlist_urls:
+            for address in self.playlist_recipients.get(self.playlist_key(playlist_url), []):
+                if address not in recipients:
+                    recipients.append(address)
+        return recipients
+    
+    def playlist_key(self, playlist_url: str) -> str:
+        """Get a stable key for a playlist (its list id when the URL has one)"""
+        query = parse_qs(urlparse(playlist_url).query)
+        return query.get('list', [None])[0] or str(self.playlist_urls.index(playlist_url))
+    
+    def state_file_for(self, playlist_url: str) -> str:
+        """Get the state file for a playlist (one file per playlist when monitoring several)"""
+        if len(self.playlist_urls) == 1:
+            return self.state_file
+        
+        root, ext = os.path.splitext(self.state_file)
+        return f"{root}_{self.playlist_key(playlist_url)}{ext or '.json'}"
     
     def is_valid(self) -> bool:
         """Check if configuration is valid"""
@@ -55,10 +284,15 @@ class Config:
     def __str__(self) -> str:
         """String representation of config (safe - no secrets)"""
         return f"""Configuration:
-  Playlist URL: {self.playlist_url}
-  Monitor Interval: {self.monitor_interval_minutes} minutes
+  Playlist URLs: {', '.join(self.playlist_urls)}
+  Monitor Interval: {self.monitor_interval_minutes} minutes ({self.schedule_mode})
+  Scan Mode: {self.scan_mode}
+  Window Size: first {self.window_size} videos
+  Max Workers: {self.max_workers}
   State File: {self.state_file}
+  State Backend: {self.state_backend}
   To Email: {self.to_email}
+  Digest Window: {self.digest_window_seconds:g} seconds
   From Email: {self.from_email}
   API Key: {'✅ Set' if self.resend_api_key else '❌ Missing'}
 """
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Local control socket for a resident monitor
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from typing import Callable, Dict, Optional
+
+# One JSON object per line in each direction
+MAX_REQUEST_BYTES = 64 * 1024
+
+def send_command(socket_path: str, command: str, timeout: Optional[float] = None) -> Optional[Dict]:
+    """Send a command to a running daemon; None when no daemon is reachable"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            # No socket, a stale one, no permission to it, ...
+            return None
+        client.sendall(json.dumps({'command': command}).encode('utf-8') + b'\n')
+        with client.makefile('rb') as reply:
+            line = reply.readline()
+    except socket.timeout:
+        return {'ok': False, 'error': f"no reply to {command!r} within {timeout:g}s"}
+    except OSError as e:
+        return {'ok': False, 'error': f"daemon not reachable during {command!r}: {e}"}
+    finally:
+        client.close()
+    
+    if not line:
+        return {'ok': False, 'error': f"daemon closed the connection during {command!r}"}
+    return json.loads(line)
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            command = json.loads(line)['command']
+            reply = self.server.control.dispatch(command)
+        except (ValueError, KeyError, TypeError):
+            reply = {'ok': False, 'error': 'expected {"command": ...}'}
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+class ControlServer:
+    """Accepts commands (check, status, reload, ...) over a local Unix socket.
+
+    Each command maps to a callable returning a JSON-serialisable dict, run
+    on the connection's thread; handlers that must not overlap with the
+    monitoring loop are expected to hand the work over to it themselves.
+    """
+    
+    def __init__(self, socket_path: str, handlers: Dict[str, Callable[[], Dict]]):
+        self.socket_path = socket_path
+        self.handlers = handlers
+        self.logger = self._setup_logger()
+        self._server: Optional[socketserver.BaseServer] = None
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the control server"""
+        logger = logging.getLogger("control_server")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def dispatch(self, command: str) -> Dict:
+        """Run one command, turning failures into an error reply"""
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {'ok': False, 'error': f"unknown command {command!r}, expected one of: "
+                                          f"{', '.join(sorted(self.handlers))}"}
+        try:
+            return handler()
+        except Exception as e:
+            self.logger.error(f"❌ Control command {command!r} failed: {e}")
+            return {'ok': False, 'error': str(e)}
+    
+    def start(self):
+        """Bind the socket and serve commands on a background thread"""
+        if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+            raise RuntimeError("The control socket needs Unix domain socket support")
+        
+        if os.path.exists(self.socket_path):
+            # A socket left behind by a daemon that didn't shut down cleanly
+            if send_command(self.socket_path, 'status', timeout=5) is not None:
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+        
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, _CommandHandler)
+        server.daemon_threads = True
+        server.control = self
+        # Only the owner may trigger checks or reloads
+        os.chmod(self.socket_path, 0o600)
+        self._server = server
+        threading.Thread(target=server.serve_forever, name="control-server", daemon=True).start()
+        self.logger.info(f"🔌 Listening for commands on {self.socket_path}")
+    
+    def close(self):
+        """Stop serving and remove the socket file"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
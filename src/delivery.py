@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Background delivery of notifications, decoupled from the monitoring cycle
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .digest import DigestNotifier
+from .email_notifier import EmailNotifier
+
+class NotificationQueue:
+    """In-process queue of change sets delivered by a dedicated worker thread"""
+    
+    def __init__(self, notifier: EmailNotifier, max_size: int = 100, digest: Optional[DigestNotifier] = None,
+                 retry_poll_seconds: float = 5):
+        self.notifier = notifier
+        # Changes are coalesced into digests; a zero window sends whatever is queued right away
+        self.digest = digest or DigestNotifier(notifier)
+        self.retry_poll_seconds = retry_poll_seconds
+        self._last_retry_poll = 0.0
+        self.logger = self._setup_logger()
+        self._queue: "queue.Queue[Tuple[List[Dict], Optional[str]]]" = queue.Queue(maxsize=max_size)
+        self._closed = False
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="notification-worker", daemon=True)
+        self._worker.start()
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the delivery queue"""
+        logger = logging.getLogger("notification_queue")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def _flush(self):
+        if not self.digest.pending:
+            return
+        if self.digest.flush():
+            self.logger.info("📧 Digest notification sent successfully")
+        else:
+            self.logger.error("❌ Failed to send digest notification")
+    
+    def _requeue_due(self):
+        """Feed outbox entries that are due for (re)delivery back into the digest"""
+        outbox = self.digest.outbox
+        if not outbox:
+            return
+        self._last_retry_poll = time.monotonic()
+        due = outbox.due()
+        if due:
+            self.logger.info(f"🔁 Retrying {len(due)} undelivered notification(s) from the outbox")
+        for change, playlist_url in due:
+            self.digest.add([change], playlist_url)
+    
+    def _next_timeout(self) -> float:
+        remaining = self.digest.seconds_until_due()
+        return 0.5 if remaining is None else min(0.5, remaining)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                item = self._queue.get(timeout=self._next_timeout())
+            except queue.Empty:
+                item = None
+            
+            taken = 0
+            try:
+                # Pick up everything already queued so it lands in the same digest
+                while item is not None:
+                    taken += 1
+                    self.digest.add(*item)
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            except Exception as e:
+                self.logger.error(f"❌ Error queuing notification for digest: {e}")
+            
+            try:
+                if time.monotonic() - self._last_retry_poll >= self.retry_poll_seconds:
+                    self._requeue_due()
+                if self.digest.due():
+                    self._flush()
+            except Exception as e:
+                self.logger.error(f"❌ Error delivering notification: {e}")
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+    
+    def enqueue(self, changes: List[Dict], playlist_url: Optional[str] = None):
+        """Hand changes to the worker and return immediately"""
+        if not changes:
+            return
+        
+        if self._closed:
+            # Shutting down - don't lose the notification
+            self.logger.warning("Delivery queue closed, sending notification synchronously")
+            self.digest.add(changes, playlist_url)
+            self._flush()
+            return
+        
+        try:
+            self._queue.put_nowait((changes, playlist_url))
+            self.logger.info(f"📬 Queued notification for {len(changes)} change(s)")
+        except queue.Full:
+            self.logger.warning("Delivery queue full, sending notification synchronously")
+            self.digest.add(changes, playlist_url)
+            self._flush()
+    
+    @property
+    def pending(self) -> int:
+        """Number of queued change sets not yet handed to the digest"""
+        return self._queue.unfinished_tasks
+    
+    def drain(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for all queued notifications to be delivered"""
+        # Polls instead of waiting on the queue's lock so this is safe to call
+        # from a signal handler that interrupted a put()
+        deadline = time.monotonic() + timeout
+        while self.pending:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+    
+    def close(self, timeout: float = 30) -> bool:
+        """Stop accepting work, drain pending notifications and stop the worker"""
+        if self._closed:
+            return True
+        self._closed = True
+        
+        if self.pending:
+            self.logger.info(f"Draining {self.pending} pending notification(s)...")
+        drained = self.drain(timeout)
+        if not drained:
+            self.logger.error(f"❌ {self.pending} notification(s) not delivered within {timeout}s")
+        
+        self._stop.set()
+        self._worker.join(timeout=1)
+        # Don't wait out the coalescing window on shutdown
+        try:
+            self._requeue_due()
+        except Exception as e:
+            self.logger.error(f"❌ Error reading the outbox: {e}")
+        self._flush()
+        return drained
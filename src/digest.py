@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Digest notifications coalesced per recipient and sent through the batch API
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .email_notifier import EmailNotifier
+from .history import HistoryStore
+from .outbox import Outbox, change_key
+
+class DigestNotifier:
+    """Collects changes for a coalescing window, then emails each recipient one digest.
+    
+    Recipients that would receive the same changes share a single rendered
+    email, and every digest of a flush goes out in one batch request.
+    """
+    
+    def __init__(self, notifier: EmailNotifier, window_seconds: float = 0,
+                 recipients_for: Optional[Callable[[Optional[str]], List[str]]] = None,
+                 outbox: Optional[Outbox] = None, history: Optional[HistoryStore] = None):
+        self.notifier = notifier
+        self.outbox = outbox
+        self.history = history
+        self.window_seconds = window_seconds
+        self.recipients_for = recipients_for or (lambda playlist_url: notifier.recipients)
+        self.logger = self._setup_logger()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[Dict]] = {}
+        self._seen: Dict[str, set] = {}
+        self._opened_at: Optional[float] = None
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the digest notifier"""
+        logger = logging.getLogger("digest_notifier")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def add(self, changes: List[Dict], playlist_url: Optional[str] = None):
+        """Add a playlist's changes to the pending digest of each of its recipients"""
+        if not changes:
+            return
+        
+        with self._lock:
+            if self._opened_at is None:
+                self._opened_at = time.monotonic()
+            for recipient in self.recipients_for(playlist_url):
+                pending = self._pending.setdefault(recipient, [])
+                seen = self._seen.setdefault(recipient, set())
+                for change in changes:
+                    key = change_key(change)
+                    if key not in seen:
+                        seen.add(key)
+                        pending.append(change)
+    
+    @property
+    def pending(self) -> int:
+        """Number of recipients with a digest waiting to be sent"""
+        return len(self._pending)
+    
+    def seconds_until_due(self) -> Optional[float]:
+        """Seconds until the current window closes, or None when nothing is pending"""
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            return max(0.0, self._opened_at + self.window_seconds - time.monotonic())
+    
+    def due(self) -> bool:
+        """Whether the coalescing window has elapsed for the pending changes"""
+        remaining = self.seconds_until_due()
+        return remaining is not None and remaining <= 0
+    
+    def _take(self) -> Dict[str, List[Dict]]:
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._seen = {}
+            self._opened_at = None
+        return pending
+    
+    def flush(self) -> bool:
+        """Send every pending digest in a single batch"""
+        pending = self._take()
+        
+        claimed = None
+        if self.outbox:
+            # Skip changes already sent (or being sent) by another run, and recipients
+            # an earlier, partly failed send already reached
+            keys = {change_key(change) for changes in pending.values() for change in changes}
+            claimed = set(self.outbox.claim(sorted(keys)))
+            delivered_to = self.outbox.delivered_to(sorted(claimed))
+            pending = {
+                recipient: [change for change in changes if change_key(change) in claimed
+                            and recipient not in delivered_to.get(change_key(change), ())]
+                for recipient, changes in pending.items()
+            }
+            pending = {recipient: changes for recipient, changes in pending.items() if changes}
+        
+        reached = self._send(pending) if pending else set()
+        sent = {recipient: changes for recipient, changes in pending.items() if recipient in reached}
+        if claimed:
+            # A change is done once every recipient it was due to has it; the rest are
+            # retried for just the recipients that missed them
+            failed = {change_key(change) for recipient, changes in pending.items() if recipient not in reached
+                      for change in changes}
+            delivered = {}
+            for recipient, changes in sent.items():
+                for change in changes:
+                    if change_key(change) in failed:
+                        delivered.setdefault(change_key(change), []).append(recipient)
+            self.outbox.complete(sorted(claimed - failed), True)
+            self.outbox.complete(sorted(failed), False, delivered_to=delivered)
+        if sent and self.history:
+            self.history.record_alerts(sent)
+        return len(sent) == len(pending)
+    
+    def _send(self, pending: Dict[str, List[Dict]]) -> Set[str]:
+        """Send each recipient its digest, returning the recipients it reached"""
+        # Recipients with identical digests share one render
+        groups: Dict[Tuple, Tuple[List[Dict], List[str]]] = {}
+        for recipient, changes in pending.items():
+            key = tuple(change_key(change) for change in changes)
+            groups.setdefault(key, (changes, []))[1].append(recipient)
+        
+        emails = []
+        try:
+            for changes, recipients in groups.values():
+                content = self.notifier.render(changes)
+                emails.extend(self.notifier.build_email(content, recipient) for recipient in recipients)
+        except Exception as e:
+            self.logger.error(f"❌ Failed to render digest: {e}")
+            return set()
+        
+        total = len({change for key in groups for change in key})
+        self.logger.info(
+            f"📨 Sending digest of {total} change(s) to {len(emails)} recipient(s) "
+            f"({len(groups)} distinct digest(s))"
+        )
+        return {email['to'][0] for email in self.notifier.deliver(emails)}
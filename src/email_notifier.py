@@ -3,22 +3,40 @@
 Email notification system using Resend API
 """
 
-import resend
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 from datetime import datetime
 
+from .email_templates import EmailTemplates
+from .metrics import metrics
+from .transport import ResendTransport
+
+# Most emails the provider accepts in one batch request
+BATCH_LIMIT = 100
+
+def parse_recipients(value: str) -> List[str]:
+    """Split a comma-separated list of email addresses"""
+    return [address.strip() for address in value.split(',') if address.strip()]
+
 class EmailNotifier:
-    def __init__(self, api_key: str, from_email: str, to_email: str):
+    def __init__(self, api_key: str, from_email: str, to_email: str,
+                 transport: Optional[ResendTransport] = None):
         self.api_key = api_key
         self.from_email = from_email
         self.to_email = to_email
+        # TO_EMAIL may list several addresses
+        self.recipients = parse_recipients(to_email) if isinstance(to_email, str) else list(to_email)
+        self.templates = EmailTemplates()
         self.logger = self._setup_logger()
         
-        # Initialize Resend
-        resend.api_key = api_key
-        
+        # One pooled connection to the API, shared by every send
+        self.transport = transport or ResendTransport(api_key)
+    
+    def close(self):
+        """Close the transport's pooled connections"""
+        self.transport.close()
+    
     def _setup_logger(self) -> logging.Logger:
         """Set up logging for the notifier"""
         logger = logging.getLogger("email_notifier")
@@ -34,111 +52,77 @@ class EmailNotifier:
         
         return logger
     
-    def send_notification(self, changes: List[Dict]) -> bool:
+    def send_notification(self, changes: List[Dict], recipients: Optional[List[str]] = None) -> bool:
         """Send email notification for video changes"""
         if not changes:
             self.logger.info("No changes to notify about")
             return True
         
         try:
-            subject = self._generate_subject(changes)
-            html_content = self._generate_html_content(changes)
-            text_content = self._generate_text_content(changes)
-            
-            self.logger.info(f"Sending notification for {len(changes)} changes")
-            
-            params = {
-                "from": self.from_email,
-                "to": [self.to_email],
-                "subject": subject,
-                "html": html_content,
-                "text": text_content,
-            }
-            
-            email = resend.Emails.send(params)
-            
-            self.logger.info(f"✅ Email sent successfully: {email}")
-            return True
-            
+            content = self.render(changes)
         except Exception as e:
-            self.logger.error(f"❌ Failed to send email: {e}")
+            self.logger.error(f"❌ Failed to render email: {e}")
             return False
+        
+        self.logger.info(f"Sending notification for {len(changes)} changes")
+        return self.send_batch([self.build_email(content, to) for to in recipients or self.recipients])
+    
+    def render(self, changes: List[Dict]) -> Dict[str, str]:
+        """Render subject, HTML and text bodies once for a set of changes"""
+        return {
+            "subject": self._generate_subject(changes),
+            "html": self._generate_html_content(changes),
+            "text": self._generate_text_content(changes),
+        }
+    
+    def build_email(self, content: Dict[str, str], recipient: str) -> Dict:
+        """Build send parameters for one recipient from rendered content"""
+        return dict(content, **{"from": self.from_email, "to": [recipient]})
+    
+    def send_batch(self, emails: List[Dict]) -> bool:
+        """Send emails in as few API calls as possible using the batch endpoint"""
+        return len(self.deliver(emails)) == len(emails)
+    
+    def deliver(self, emails: List[Dict]) -> List[Dict]:
+        """Send emails in batches of up to BATCH_LIMIT, returning the ones that went out.
+        
+        A failed batch doesn't stop the ones after it, so callers can tell
+        exactly who was sent what.
+        """
+        sent = []
+        if not emails:
+            return sent
+        
+        with metrics.stage('notify') as stage:
+            for start in range(0, len(emails), BATCH_LIMIT):
+                chunk = emails[start:start + BATCH_LIMIT]
+                try:
+                    if len(chunk) == 1:
+                        result = self.transport.send(chunk[0])
+                    else:
+                        result = self.transport.send_batch(chunk)
+                except Exception as e:
+                    stage.fail()
+                    self.logger.error(f"❌ Failed to send {len(chunk)} email(s): {e}")
+                    continue
+                self.logger.info(f"✅ {len(chunk)} email(s) sent successfully: {result}")
+                sent.extend(chunk)
+        return sent
     
     def _generate_subject(self, changes: List[Dict]) -> str:
         """Generate email subject line"""
         if len(changes) == 1:
-            return f"🎉 Member-only video became free: {changes[0]['title'][:50]}..."
+            return f"🎉 Member-only video became free: {(changes[0].get('title') or changes[0]['video_id'])[:50]}..."
         else:
             return f"🎉 {len(changes)} member-only videos became free!"
     
     def _generate_html_content(self, changes: List[Dict]) -> str:
         """Generate HTML email content"""
-        html = """
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .header { background-color: #f4f4f4; padding: 20px; text-align: center; }
-                .content { padding: 20px; }
-                .video { background-color: #f9f9f9; margin: 15px 0; padding: 15px; border-radius: 5px; }
-                .video-title { font-size: 18px; font-weight: bold; margin-bottom: 10px; }
-                .video-url { color: #0066cc; text-decoration: none; }
-                .status { margin: 5px 0; }
-                .timestamp { color: #666; font-size: 12px; }
-                .footer { background-color: #f4f4f4; padding: 15px; text-align: center; font-size: 12px; color: #666; }
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>🎉 YouTube Member-Only Videos Now Free!</h1>
-            </div>
-            
-            <div class="content">
-                <p>Great news! The following member-only videos have become free to watch:</p>
-        """
-        
-        for change in changes:
-            html += f"""
-                <div class="video">
-                    <div class="video-title">{change['title']}</div>
-                    <div class="status">
-                        <strong>Status Change:</strong> {change['previous_status']} → {change['current_status']}
-                    </div>
-                    <div>
-                        <a href="{change['url']}" class="video-url">Watch Now →</a>
-                    </div>
-                    <div class="timestamp">Detected: {change['detected_at']}</div>
-                </div>
-            """
-        
-        html += """
-                <p>Don't miss out - these videos might return to member-only status later!</p>
-            </div>
-            
-            <div class="footer">
-                <p>YouTube Playlist Monitor • Automated notification system</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html
+        return self.templates.render_html(changes)
     
     def _generate_text_content(self, changes: List[Dict]) -> str:
         """Generate plain text email content"""
-        text = "🎉 YouTube Member-Only Videos Now Free!\n\n"
-        text += "The following member-only videos have become free to watch:\n\n"
-        
-        for i, change in enumerate(changes, 1):
-            text += f"{i}. {change['title']}\n"
-            text += f"   Status: {change['previous_status']} → {change['current_status']}\n"
-            text += f"   Watch: {change['url']}\n"
-            text += f"   Detected: {change['detected_at']}\n\n"
-        
-        text += "Don't miss out - these videos might return to member-only status later!\n\n"
-        text += "---\nYouTube Playlist Monitor • Automated notification system"
-        
-        return text
+        return self.templates.render_text(changes)
     
     def send_test_notification(self) -> bool:
         """Send a test notification to verify email setup"""
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Precompiled templates for notification emails
+"""
+
+import html
+from string import Template
+from typing import Dict, List
+
+HTML_PAGE = """
+<html>
+<head>
+    <style>
+$css
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>🎉 YouTube Member-Only Videos Now Free!</h1>
+    </div>
+
+    <div class="content">
+        <p>Great news! The following member-only videos have become free to watch:</p>
+$videos
+        <p>Don't miss out - these videos might return to member-only status later!</p>
+    </div>
+
+    <div class="footer">
+        <p>YouTube Playlist Monitor • Automated notification system</p>
+    </div>
+</body>
+</html>
+"""
+
+HTML_CSS = """\
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background-color: #f4f4f4; padding: 20px; text-align: center; }
+        .content { padding: 20px; }
+        .video { background-color: #f9f9f9; margin: 15px 0; padding: 15px; border-radius: 5px; }
+        .video-title { font-size: 18px; font-weight: bold; margin-bottom: 10px; }
+        .video-url { color: #0066cc; text-decoration: none; }
+        .status { margin: 5px 0; }
+        .timestamp { color: #666; font-size: 12px; }
+        .footer { background-color: #f4f4f4; padding: 15px; text-align: center; font-size: 12px; color: #666; }"""
+
+HTML_VIDEO = """
+        <div class="video">
+            <div class="video-title">$title</div>
+            <div class="status">
+                <strong>Status Change:</strong> $previous_status → $current_status
+            </div>
+            <div>
+                <a href="$url" class="video-url">Watch Now →</a>
+            </div>
+            <div class="timestamp">Detected: $detected_at</div>
+        </div>
+"""
+
+TEXT_PAGE = """🎉 YouTube Member-Only Videos Now Free!
+
+The following member-only videos have become free to watch:
+
+$videos\
+Don't miss out - these videos might return to member-only status later!
+
+---
+YouTube Playlist Monitor • Automated notification system"""
+
+TEXT_VIDEO = """$number. $title
+   Status: $previous_status → $current_status
+   Watch: $url
+   Detected: $detected_at
+
+"""
+
+VIDEO_FIELDS = ('title', 'previous_status', 'current_status', 'url', 'detected_at')
+
+class EmailTemplates:
+    """Notification templates compiled once and rendered with a single join"""
+
+    def __init__(self):
+        # The page shell (including the CSS) is filled in once; only the
+        # per-video fragments are substituted on each render
+        html_head, html_tail = Template(HTML_PAGE).safe_substitute(css=HTML_CSS).split('$videos')
+        text_head, text_tail = TEXT_PAGE.split('$videos')
+        self._html_head = html_head
+        self._html_tail = html_tail
+        self._text_head = text_head
+        self._text_tail = text_tail
+        self._html_video = Template(HTML_VIDEO).substitute
+        self._text_video = Template(TEXT_VIDEO).substitute
+
+    @staticmethod
+    def _fields(change: Dict) -> Dict:
+        """Template values of a change; a video without a title goes by its id"""
+        fields = {field: change[field] for field in VIDEO_FIELDS}
+        fields['title'] = change.get('title') or change['video_id']
+        return fields
+
+    def render_html(self, changes: List[Dict]) -> str:
+        """Render the HTML body, escaping every value taken from the changes"""
+        escape = html.escape
+        parts = [self._html_head]
+        parts.extend(
+            self._html_video({field: escape(str(value)) for field, value in self._fields(change).items()})
+            for change in changes
+        )
+        parts.append(self._html_tail)
+        return ''.join(parts)
+
+    def render_text(self, changes: List[Dict]) -> str:
+        """Render the plain text body"""
+        parts = [self._text_head]
+        parts.extend(
+            self._text_video(self._fields(change), number=i)
+            for i, change in enumerate(changes, 1)
+        )
+        parts.append(self._text_tail)
+        return ''.join(parts)
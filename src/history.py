@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Timeline of video status observations, transitions and alerts
+"""
+
+import json
+import logging
+import sqlite3
+import statistics
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (
+    playlist TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    title TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    open INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS spans_by_video ON spans (video_id, first_seen);
+CREATE INDEX IF NOT EXISTS spans_by_time ON spans (first_seen);
+CREATE INDEX IF NOT EXISTS spans_open ON spans (playlist) WHERE open = 1;
+CREATE TABLE IF NOT EXISTS transitions (
+    playlist TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    title TEXT,
+    previous_status TEXT,
+    current_status TEXT,
+    detail TEXT,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_by_video ON transitions (video_id, at);
+CREATE INDEX IF NOT EXISTS transitions_by_time ON transitions (at);
+CREATE TABLE IF NOT EXISTS alerts (
+    video_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    title TEXT,
+    recipients INTEGER NOT NULL,
+    sent_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_by_video ON alerts (video_id, sent_at);
+CREATE INDEX IF NOT EXISTS alerts_by_time ON alerts (sent_at);
+CREATE TABLE IF NOT EXISTS checks (
+    playlist TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    videos INTEGER,
+    changes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checks_by_time ON checks (checked_at);
+CREATE TABLE IF NOT EXISTS archive (
+    kind TEXT NOT NULL,
+    month TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (kind, month)
+);
+"""
+
+# Columns of each kind of row, the time column it is queried by, and the
+# condition for a row old enough to be archived to also be finished
+KINDS = {
+    'spans': (('playlist', 'video_id', 'status', 'title', 'first_seen', 'last_seen', 'open'), 'first_seen',
+              "open = 0 AND last_seen < ?"),
+    'transitions': (('playlist', 'video_id', 'type', 'title', 'previous_status', 'current_status', 'detail', 'at'),
+                    'at', "at < ?"),
+    'alerts': (('video_id', 'type', 'title', 'recipients', 'sent_at'), 'sent_at', "sent_at < ?"),
+    'checks': (('playlist', 'checked_at', 'videos', 'changes'), 'checked_at', "checked_at < ?"),
+}
+
+# Transitions that mean a video just became free to watch
+FREED = ('new_free_video', 'member_to_free')
+
+def _month(timestamp: float) -> str:
+    return time.strftime('%Y-%m', time.gmtime(timestamp))
+
+def _timestamp(value: Optional[str]) -> float:
+    return datetime.fromisoformat(value).timestamp() if value else time.time()
+
+class HistoryStore:
+    """Append-only history of what each check saw, in one SQLite file.
+    
+    Status observations are kept as spans: one row per run of consecutive
+    checks that saw a video with the same status, ending at the check that
+    saw it change. An unchanged playlist costs one UPDATE per check rather
+    than a row per video. Transitions, alerts and checks are appended as
+    they happen. Finished rows older than
+    `compress_after_days` move into one zlib-compressed block per kind and
+    month, which queries read back only for the months they cover.
+    
+    History is best-effort: errors are logged, never raised to the monitor.
+    """
+    
+    def __init__(self, db_path: str, compress_after_days: float = 90):
+        self.db_path = db_path
+        self.compress_after_days = compress_after_days
+        self.logger = self._setup_logger()
+        self._lock = threading.Lock()
+        # Open span (rowid, status) per video of each playlist, read on first use
+        self._open_spans: Dict[str, Dict[str, Tuple[int, str]]] = {}
+        self._compacted_at = 0.0
+        
+        # Monitors and the delivery worker record from different threads
+        # (never concurrently - guarded by the lock)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(HISTORY_SCHEMA)
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the history store"""
+        logger = logging.getLogger("history_store")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def _spans_of(self, playlist: str) -> Dict[str, Tuple[int, str]]:
+        spans = self._open_spans.get(playlist)
+        if spans is None:
+            rows = self._conn.execute(
+                "SELECT rowid, video_id, status FROM spans WHERE playlist = ? AND open = 1", (playlist,)
+            )
+            spans = self._open_spans[playlist] = {video_id: (rowid, status) for rowid, video_id, status in rows}
+        return spans
+    
+    def record_check(self, playlist: str, checked_at: str, videos: Optional[Iterable] = None,
+                     changes: Iterable[Dict] = (), complete: bool = True):
+        """Record one check of a playlist.
+        
+        `videos` are the records the check saw (None when the playlist was
+        unchanged since the previous check); `changes` are the transitions it
+        found, in their dict form. `complete` is False when `videos` are only
+        the head of the playlist: spans of videos outside it are left open as
+        last seen rather than closed as if the videos had been removed.
+        """
+        now = _timestamp(checked_at)
+        changes = list(changes)
+        try:
+            with self._lock, self._conn:
+                spans = self._spans_of(playlist)
+                count = None
+                if videos is not None:
+                    seen = self._observe(playlist, spans, videos, now, complete)
+                    count = len(seen)
+                if complete or videos is None:
+                    # Every span still open was seen again by this check
+                    self._conn.execute(
+                        "UPDATE spans SET last_seen = ? WHERE playlist = ? AND open = 1", (now, playlist)
+                    )
+                else:
+                    self._conn.executemany(
+                        "UPDATE spans SET last_seen = ? WHERE rowid = ?", [(now, spans[video_id][0]) for video_id in seen]
+                    )
+                self._conn.executemany(
+                    "INSERT INTO transitions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(playlist, change['video_id'], change['type'], change.get('title'),
+                      change.get('previous_status'), change.get('current_status'), change.get('detail'),
+                      _timestamp(change.get('detected_at'))) for change in changes]
+                )
+                self._conn.execute("INSERT INTO checks VALUES (?, ?, ?, ?)", (playlist, now, count, len(changes)))
+        except sqlite3.Error as e:
+            # Re-read the open spans next time rather than trust a rolled-back cache
+            self._open_spans.pop(playlist, None)
+            self.logger.warning(f"Error recording check history: {e}")
+            return
+        
+        if time.time() - self._compacted_at >= 86400:
+            self.compact()
+    
+    def _observe(self, playlist: str, spans: Dict[str, Tuple[int, str]], videos: Iterable, now: float,
+                 complete: bool = True) -> Set[str]:
+        """Open spans for new statuses and, after a complete check, close those of videos no longer listed"""
+        seen = set()
+        closed = []
+        for video in videos:
+            seen.add(video.id)
+            status = video.availability.value
+            span = spans.get(video.id)
+            if span is not None:
+                if span[1] == status:
+                    continue
+                closed.append((now, span[0]))
+            cursor = self._conn.execute(
+                "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, 1)", (playlist, video.id, status, video.title, now, now)
+            )
+            spans[video.id] = (cursor.lastrowid, status)
+        
+        if complete:
+            for video_id in [video_id for video_id in spans if video_id not in seen]:
+                closed.append((now, spans.pop(video_id)[0]))
+        # A closed span ends at the check that saw the status change
+        self._conn.executemany("UPDATE spans SET open = 0, last_seen = ? WHERE rowid = ?", closed)
+        return seen
+    
+    def record_alerts(self, sent: Dict[str, List[Dict]]):
+        """Record the changes of a sent digest, given the changes sent to each recipient"""
+        recipients = Counter()
+        changes = {}
+        for recipient_changes in sent.values():
+            for change in recipient_changes:
+                key = (change['video_id'], change['type'])
+                recipients[key] += 1
+                changes[key] = change
+        
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO alerts VALUES (?, ?, ?, ?, ?)",
+                    [(video_id, kind, changes[(video_id, kind)].get('title'), count, now)
+                     for (video_id, kind), count in recipients.items()]
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error recording alert history: {e}")
+    
+    def compact(self):
+        """Move finished rows older than `compress_after_days` into monthly compressed blocks"""
+        self._compacted_at = time.time()
+        cutoff = self._compacted_at - self.compress_after_days * 86400
+        archived = 0
+        try:
+            with self._lock, self._conn:
+                for kind, (columns, time_column, finished) in KINDS.items():
+                    rows = self._conn.execute(
+                        f"SELECT rowid, {', '.join(columns)} FROM {kind} WHERE {finished}", (cutoff,)
+                    ).fetchall()
+                    if not rows:
+                        continue
+                    
+                    by_month: Dict[str, List[tuple]] = {}
+                    at = columns.index(time_column) + 1
+                    for row in rows:
+                        by_month.setdefault(_month(row[at]), []).append(row[1:])
+                    for month, month_rows in by_month.items():
+                        existing = self._conn.execute(
+                            "SELECT data FROM archive WHERE kind = ? AND month = ?", (kind, month)
+                        ).fetchone()
+                        if existing:
+                            month_rows = [tuple(row) for row in json.loads(zlib.decompress(existing[0]))] + month_rows
+                        data = zlib.compress(json.dumps(month_rows, ensure_ascii=False).encode('utf-8'), 9)
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?)", (kind, month, len(month_rows), data)
+                        )
+                    self._conn.executemany(f"DELETE FROM {kind} WHERE rowid = ?", [(row[0],) for row in rows])
+                    archived += len(rows)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error compressing old history: {e}")
+            return
+        
+        if archived:
+            self.logger.info(f"🗜️ Compressed {archived} history rows older than {self.compress_after_days:g} days")
+    
+    def _rows(self, kind: str, since: Optional[float] = None, until: Optional[float] = None,
+              video_id: Optional[str] = None) -> Iterator[tuple]:
+        """Rows of a kind in a time range (and for one video), live and archived"""
+        columns, time_column, _ = KINDS[kind]
+        where, params = [], []
+        if since is not None:
+            where.append(f"{time_column} >= ?")
+            params.append(since)
+        if until is not None:
+            where.append(f"{time_column} < ?")
+            params.append(until)
+        if video_id is not None:
+            where.append("video_id = ?")
+            params.append(video_id)
+        
+        with self._lock:
+            live = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM {kind}" + (f" WHERE {' AND '.join(where)}" if where else ""),
+                params
+            ).fetchall()
+            month_where, month_params = ["kind = ?"], [kind]
+            if since is not None:
+                month_where.append("month >= ?")
+                month_params.append(_month(since))
+            if until is not None:
+                month_where.append("month <= ?")
+                month_params.append(_month(until))
+            blocks = self._conn.execute(
+                f"SELECT data FROM archive WHERE {' AND '.join(month_where)}", month_params
+            ).fetchall()
+        
+        at = columns.index(time_column)
+        video = columns.index('video_id') if video_id is not None else None
+        for (data,) in blocks:
+            for row in json.loads(zlib.decompress(data)):
+                if (since is None or row[at] >= since) and (until is None or row[at] < until) \
+                        and (video is None or row[video] == video_id):
+                    yield tuple(row)
+        yield from live
+    
+    def timeline(self, video_id: str) -> List[Dict]:
+        """Everything recorded about one video, oldest first"""
+        events = []
+        for playlist, _, status, title, first_seen, last_seen, still_open in self._rows('spans', video_id=video_id):
+            events.append({'at': first_seen, 'until': last_seen, 'event': 'observed', 'status': status,
+                           'title': title, 'playlist': playlist, 'ongoing': bool(still_open)})
+        for playlist, _, kind, title, previous, current, detail, at in self._rows('transitions', video_id=video_id):
+            events.append({'at': at, 'event': kind, 'status': current, 'previous_status': previous,
+                           'title': title, 'detail': detail, 'playlist': playlist})
+        for _, kind, title, recipients, sent_at in self._rows('alerts', video_id=video_id):
+            events.append({'at': sent_at, 'event': 'alert', 'type': kind, 'title': title, 'recipients': recipients})
+        return sorted(events, key=lambda event: event['at'])
+    
+    def stats(self, since: float, until: Optional[float] = None) -> Dict:
+        """Aggregate statistics of the checks, transitions and alerts in a time range"""
+        until = until or time.time()
+        
+        checks = 0
+        playlists = set()
+        for playlist, *_ in self._rows('checks', since, until):
+            checks += 1
+            playlists.add(playlist)
+        
+        transitions = Counter()
+        # Local hour of day at which videos became free
+        freed_hours = Counter()
+        for row in self._rows('transitions', since, until):
+            transitions[row[2]] += 1
+            if row[2] in FREED:
+                freed_hours[datetime.fromtimestamp(row[7]).hour] += 1
+        
+        alerts = 0
+        emails = 0
+        for *_, recipients, _ in self._rows('alerts', since, until):
+            alerts += 1
+            emails += recipients
+        
+        # How long the free spells that started in the range lasted, from the first check
+        # that saw the video free to the one that saw it change; spells still going are only counted
+        free_hours = []
+        still_free = 0
+        for _, _, status, _, first_seen, last_seen, still_open in self._rows('spans', since, until):
+            if status != 'limited_free':
+                continue
+            if still_open:
+                still_free += 1
+            else:
+                free_hours.append((last_seen - first_seen) / 3600)
+        
+        return {
+            'since': since,
+            'until': until,
+            'checks': checks,
+            'playlists': len(playlists),
+            'transitions': dict(transitions),
+            'alerts': alerts,
+            'emails': emails,
+            'free_spells': len(free_hours),
+            'still_free': still_free,
+            'avg_free_hours': statistics.fmean(free_hours) if free_hours else None,
+            'median_free_hours': statistics.median(free_hours) if free_hours else None,
+            'freed_by_hour': dict(sorted(freed_hours.items())),
+        }
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing metrics with Prometheus text exposition
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+METRIC_PREFIX = "ytmonitor"
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+class StageTimer:
+    """Handle for a running stage; call fail() when the stage didn't succeed"""
+    
+    def __init__(self):
+        self.succeeded = True
+    
+    def fail(self):
+        self.succeeded = False
+
+class MetricsRegistry:
+    """Process-wide registry of stage durations and success/failure counters"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Histogram] = {}
+        self._results: Dict[Tuple[str, str], int] = {}
+        # Values read from their owner at export time: name -> (help, type, label, collect)
+        self._collectors: Dict[str, Tuple[str, str, str, Callable[[], Dict[str, float]]]] = {}
+        self.started_at = time.time()
+    
+    def observe(self, stage: str, seconds: float, succeeded: bool = True):
+        """Record one run of a stage"""
+        result = 'success' if succeeded else 'failure'
+        with self._lock:
+            self._durations.setdefault(stage, Histogram()).observe(seconds)
+            self._results[(stage, result)] = self._results.get((stage, result), 0) + 1
+    
+    def register(self, name: str, help_text: str, kind: str, label: str,
+                 collect: Callable[[], Dict[str, float]]):
+        """Export a gauge or counter whose values `collect` returns per `label` value"""
+        with self._lock:
+            self._collectors[name] = (help_text, kind, label, collect)
+    
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[StageTimer]:
+        """Time a block as a stage; exceptions and fail() count as failures"""
+        timer = StageTimer()
+        start = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            timer.fail()
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, timer.succeeded)
+    
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._results.clear()
+            self.started_at = time.time()
+    
+    def to_dict(self) -> Dict:
+        """Summarise all stages as plain data (for JSON dumps)"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._durations.items()):
+                stages[stage] = {
+                    'count': histogram.count,
+                    'success': self._results.get((stage, 'success'), 0),
+                    'failure': self._results.get((stage, 'failure'), 0),
+                    'total_seconds': round(histogram.sum, 6),
+                    'avg_seconds': round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                    'min_seconds': round(histogram.min, 6) if histogram.count else 0.0,
+                    'max_seconds': round(histogram.max, 6),
+                }
+            collectors = dict(self._collectors)
+        values = {name: collect() for name, (_, _, _, collect) in sorted(collectors.items())}
+        return {'started_at': self.started_at, 'stages': stages, 'values': values}
+    
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        duration = f"{METRIC_PREFIX}_stage_duration_seconds"
+        total = f"{METRIC_PREFIX}_stage_total"
+        lines = [
+            f"# HELP {duration} Duration of monitoring stages in seconds.",
+            f"# TYPE {duration} histogram",
+        ]
+        
+        with self._lock:
+            for stage, histogram in sorted(self._durations.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f'{duration}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{duration}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{duration}_count{{stage="{stage}"}} {histogram.count}')
+            
+            lines.append(f"# HELP {total} Monitoring stage runs by result.")
+            lines.append(f"# TYPE {total} counter")
+            for (stage, result), count in sorted(self._results.items()):
+                lines.append(f'{total}{{stage="{stage}",result="{result}"}} {count}')
+            collectors = dict(self._collectors)
+        
+        # Collected outside the lock, as their owners take locks of their own
+        for name, (help_text, kind, label, collect) in sorted(collectors.items()):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for key, value in sorted(collect().items()):
+                lines.append(f'{METRIC_PREFIX}_{name}{{{label}="{key}"}} {value}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def write_json(self, path: str):
+        """Dump the summary to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+# Shared by every component in the process
+metrics = MetricsRegistry()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: Optional[MetricsRegistry] = None):
+    """Serve /metrics on a background thread and return the server"""
+    # Only the monitor mode serves metrics, so the HTTP stack is imported here
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            
+            body = (registry or metrics).render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            logging.getLogger("metrics").debug(format % args)
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Concurrent monitoring of multiple YouTube playlists
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .playlist_monitor import PlaylistMonitor
+
+class MultiPlaylistMonitor:
+    def __init__(self, monitors: List[PlaylistMonitor], max_workers: int = 4):
+        self.monitors = monitors
+        self.max_workers = max(1, min(max_workers, len(monitors) or 1))
+        self.logger = self._setup_logger()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="playlist-monitor"
+        )
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the multi-playlist monitor"""
+        logger = logging.getLogger("multi_monitor")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def _monitor_one(self, monitor: PlaylistMonitor) -> List[Dict]:
+        """Run one monitoring cycle for a single playlist, isolating failures"""
+        try:
+            return monitor.monitor_once()
+        except Exception as e:
+            self.logger.error(f"Error monitoring {monitor.playlist_url}: {e}")
+            return []
+    
+    def monitor_all(self) -> Dict[str, List[Dict]]:
+        """Monitor all playlists concurrently and return changes per playlist URL"""
+        start = time.monotonic()
+        self.logger.info(
+            f"Monitoring {len(self.monitors)} playlist(s) with {self.max_workers} worker(s)"
+        )
+        
+        futures = {
+            monitor.playlist_url: self._executor.submit(self._monitor_one, monitor)
+            for monitor in self.monitors
+        }
+        results = {url: future.result() for url, future in futures.items()}
+        
+        self.logger.info(f"Monitored {len(results)} playlist(s) in {time.monotonic() - start:.2f}s")
+        return results
+    
+    def close(self):
+        """Shut down the worker pool and release each monitor's resources"""
+        self._executor.shutdown(wait=True)
+        for monitor in self.monitors:
+            monitor.close_session()
+            monitor.state_store.close()
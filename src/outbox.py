@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Disk-backed notification outbox with retry, backoff and idempotency
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .state_store import write_json_atomic
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; the in-process lock still applies
+    fcntl = None
+
+def change_key(change: Dict) -> str:
+    """Idempotency key of a change: one notification per video and transition.
+    
+    A transition is told apart from a later repeat of it by the check it was
+    detected against, so re-detections after a failed save stay deduplicated.
+    """
+    key = f"{change['video_id']}:{change['type']}"
+    if change.get('previous_checked_at'):
+        key += f":{change['previous_checked_at']}"
+    return key
+
+class Outbox:
+    """Detected changes waiting to be (re)delivered.
+    
+    Changes are written here before the playlist state advances, so a failed
+    send is retried instead of lost. Entries move from pending to sending
+    (claimed by one sender for a lease period) to sent; sent entries are kept
+    for a while so the same transition is never announced twice, even by
+    overlapping runs sharing the file.
+    """
+    
+    def __init__(self, path: str, retry_base_seconds: float = 60, retry_max_seconds: float = 3600,
+                 lease_seconds: float = 300, retention_days: float = 30):
+        self.path = path
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_days * 86400
+        self.logger = self._setup_logger()
+        self._lock = threading.Lock()
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the outbox"""
+        logger = logging.getLogger("notification_outbox")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    @contextmanager
+    def _entries(self) -> Iterator[Dict[str, Dict]]:
+        """Load the entries under an exclusive lock and write them back afterwards"""
+        with self._lock, open(self.path + '.lock', 'a') as lock_file:
+            # Overlapping runs (cron + monitor) serialise on the lock file
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            
+            entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r') as f:
+                        entries = json.load(f).get('entries', {})
+                except (OSError, ValueError) as e:
+                    self.logger.error(f"Error loading outbox, starting empty: {e}")
+            
+            before = json.dumps(entries, sort_keys=True)
+            yield entries
+            
+            now = time.time()
+            for key in [k for k, entry in entries.items()
+                        if entry['status'] == 'sent' and now - entry['sent_at'] > self.retention_seconds]:
+                del entries[key]
+            
+            if json.dumps(entries, sort_keys=True) != before:
+                write_json_atomic(self.path, {'entries': entries}, indent=2)
+    
+    def add(self, changes: List[Dict], playlist_url: Optional[str] = None) -> List[Dict]:
+        """Record detected changes, returning those that weren't already known"""
+        added = []
+        with self._entries() as entries:
+            for change in changes:
+                key = change_key(change)
+                if key in entries:
+                    continue
+                entries[key] = {
+                    'change': change,
+                    'playlist_url': playlist_url,
+                    'status': 'pending',
+                    'attempts': 0,
+                    'next_attempt_at': time.time(),
+                    'created_at': time.time(),
+                }
+                added.append(change)
+        return added
+    
+    def due(self) -> List[Tuple[Dict, Optional[str]]]:
+        """Changes whose retry time has come, or whose sender's lease ran out"""
+        now = time.time()
+        with self._entries() as entries:
+            return [
+                (entry['change'], entry['playlist_url'])
+                for entry in entries.values()
+                if (entry['status'] == 'pending' and entry['next_attempt_at'] <= now)
+                or (entry['status'] == 'sending' and entry['lease_until'] <= now)
+            ]
+    
+    def claim(self, keys: List[str]) -> List[str]:
+        """Mark entries as being sent by this process, returning the ones claimed"""
+        now = time.time()
+        claimed = []
+        with self._entries() as entries:
+            for key in keys:
+                entry = entries.get(key)
+                if entry is None or entry['status'] == 'sent':
+                    continue
+                if entry['status'] == 'sending' and entry['lease_until'] > now:
+                    continue
+                entry['status'] = 'sending'
+                entry['lease_until'] = now + self.lease_seconds
+                claimed.append(key)
+        return claimed
+    
+    def delivered_to(self, keys: List[str]) -> Dict[str, List[str]]:
+        """Recipients that already received each change, from earlier partly failed sends"""
+        with self._entries() as entries:
+            return {key: entries[key]['delivered_to'] for key in keys
+                    if key in entries and entries[key].get('delivered_to')}
+    
+    def complete(self, keys: List[str], succeeded: bool, delivered_to: Optional[Dict[str, List[str]]] = None):
+        """Record the outcome of a send, scheduling a retry with exponential backoff on failure.
+        
+        `delivered_to` lists, per failed change, the recipients it did reach,
+        so the retry only goes to the others.
+        """
+        delivered_to = delivered_to or {}
+        now = time.time()
+        with self._entries() as entries:
+            for key in keys:
+                entry = entries.get(key)
+                if entry is None:
+                    continue
+                entry['attempts'] += 1
+                entry.pop('lease_until', None)
+                if succeeded:
+                    entry['status'] = 'sent'
+                    entry['sent_at'] = now
+                else:
+                    delay = min(self.retry_max_seconds,
+                                self.retry_base_seconds * 2 ** (entry['attempts'] - 1))
+                    entry['status'] = 'pending'
+                    entry['next_attempt_at'] = now + delay
+                    if delivered_to.get(key):
+                        entry['delivered_to'] = sorted(set(entry.get('delivered_to', [])) | set(delivered_to[key]))
+        
+        if not succeeded and keys:
+            self.logger.warning(f"⏳ {len(keys)} notification(s) will be retried with backoff")
+    
+    def pending_count(self) -> int:
+        """Number of changes not yet delivered"""
+        with self._entries() as entries:
+            return sum(1 for entry in entries.values() if entry['status'] != 'sent')
@@ -4,18 +4,104 @@ YouTube Playlist Monitor - Core monitoring functionality
 """
 
 import yt_dlp
+import hashlib
 import json
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
+from .history import HistoryStore
+from .metrics import metrics
+from .outbox import Outbox
+from .records import (Availability, ChangeEvent, ChangeType, Signal, VideoRecord, as_record,
+                      state_from_dict, state_to_dict)
+from .rules import GATED_AVAILABILITY, OPEN_AVAILABILITY, RuleSet, normalise_availability
+from .state_store import JsonStateStore, StateStore, write_json_atomic
+from .throttle import HostThrottled, rate_limiter
+from .verifier import AvailabilityVerifier
+
+SCAN_MODES = ('head', 'incremental', 'full')
+WATERMARK_CONFIRM_RUN = 3
+# Videos compared (one state store lookup) and verified per step of the scan,
+# about one page of playlist entries
+DIFF_BATCH_SIZE = 100
+MAX_URL_REDIRECTS = 3
+
+# Video fields that make up a state's fingerprint
+FINGERPRINT_FIELDS = ('id', 'title', 'is_member_only', 'availability', 'metadata_availability')
+
+class WatermarkMismatch(Exception):
+    """The playlist ordering is inconsistent with the stored watermark"""
+
+def _batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Lists of up to `size` items, pulled from `iterable` only as each one is needed"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def _moved(order: List[int]) -> List[int]:
+    """Indexes into `order` outside its longest increasing subsequence: the fewest
+    moved items that explain how the previous order became `order`"""
+    if all(a < b for a, b in zip(order, order[1:])):
+        return []
+    
+    # tails[k] ends the lowest-ending increasing subsequence of length k + 1 seen so far
+    tail_values = []
+    tails = []
+    parents = [-1] * len(order)
+    for k, value in enumerate(order):
+        j = bisect_left(tail_values, value)
+        if j:
+            parents[k] = tails[j - 1]
+        if j == len(tails):
+            tail_values.append(value)
+            tails.append(k)
+        else:
+            tail_values[j] = value
+            tails[j] = k
+    
+    in_order = set()
+    k = tails[-1]
+    while k >= 0:
+        in_order.add(k)
+        k = parents[k]
+    return [k for k in range(len(order)) if k not in in_order]
+
 class PlaylistMonitor:
-    def __init__(self, playlist_url: str, state_file: str = "playlist_state.json"):
+    def __init__(self, playlist_url: str, state_file: str = "playlist_state.json",
+                 window_size: int = 3, session_ttl_seconds: float = 3600,
+                 scan_mode: str = 'head', watermark_size: int = 10,
+                 full_rescan_hours: float = 24, state_store: Optional[StateStore] = None,
+                 outbox: Optional[Outbox] = None, rules: Optional[RuleSet] = None,
+                 verifier: Optional[AvailabilityVerifier] = None, history: Optional[HistoryStore] = None):
+        if scan_mode not in SCAN_MODES:
+            raise ValueError(f"Unknown scan mode: {scan_mode}")
+        
         self.playlist_url = playlist_url
         self.state_file = state_file
+        self.window_size = window_size
+        self.session_ttl_seconds = session_ttl_seconds
+        self.scan_mode = scan_mode
+        self.watermark_size = watermark_size
+        self.full_rescan_hours = full_rescan_hours
+        self.state_store = state_store or JsonStateStore(state_file)
+        self.outbox = outbox
+        self.rules = rules or RuleSet()
+        self.verifier = verifier
+        self.history = history
         self.logger = self._setup_logger()
         
+        # Long-lived yt-dlp session, reused across monitoring cycles
+        self._ydl = None
+        self._ydl_created_at = 0.0
+        self._ydl_setup_seconds = 0.0
+    
     def _setup_logger(self) -> logging.Logger:
         """Set up logging for the monitor"""
         logger = logging.getLogger("playlist_monitor")
@@ -31,168 +117,683 @@ class PlaylistMonitor:
         
         return logger
     
-    def fetch_playlist_videos(self) -> Optional[Dict]:
-        """Fetch first 3 videos from playlist using yt-dlp"""
+    def _get_session(self) -> yt_dlp.YoutubeDL:
+        """Get the warm yt-dlp session, building a new one if missing or expired"""
+        if self._ydl is not None:
+            age = time.monotonic() - self._ydl_created_at
+            if age < self.session_ttl_seconds:
+                self.logger.info(
+                    f"Reusing warm yt-dlp session (saved ~{self._ydl_setup_seconds:.2f}s setup)"
+                )
+                return self._ydl
+            self.logger.info(f"yt-dlp session expired after {age:.0f}s, rebuilding")
+            self.close_session()
+        
         ydl_opts = {
             'quiet': True,
             'extract_flat': True,
             'no_warnings': True,
         }
         
+        start = time.monotonic()
+        # Every request of the session waits for the shared per-host rate limit
+        self._ydl = rate_limiter.install(yt_dlp.YoutubeDL(ydl_opts))
+        self._ydl_created_at = time.monotonic()
+        self._ydl_setup_seconds = self._ydl_created_at - start
+        self.logger.info(f"Created yt-dlp session in {self._ydl_setup_seconds:.2f}s")
+        return self._ydl
+    
+    def close_session(self):
+        """Close the warm yt-dlp session, if any"""
+        if self._ydl is None:
+            return
         try:
-            self.logger.info(f"Fetching playlist: {self.playlist_url}")
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.playlist_url, download=False)
+            self._ydl.close()
+        except Exception as e:
+            self.logger.warning(f"Error closing yt-dlp session: {e}")
+        self._ydl = None
+    
+    def _build_video(self, entry: Dict, position: int, checked_at: str) -> VideoRecord:
+        """Build a video record from a flat playlist entry using its title and metadata"""
+        video_id = entry.get('id')
+        video_title = entry.get('title')
+        
+        self.logger.info(f"Processing video {position}: {video_title}")
+        
+        # Flat entries carry availability from the members-only/premium badges
+        metadata_availability = normalise_availability(entry.get('availability'))
+        duration = entry.get('duration')
+        is_free, matched_rule = self.rules.classify(video_title)
+        
+        # Metadata wins over the title when YouTube tells us either way
+        if metadata_availability in GATED_AVAILABILITY:
+            is_member_only = True
+            signal = Signal.METADATA
+            self.logger.info(f"Video {video_id}: Member-only ({metadata_availability} badge)")
+        elif metadata_availability in OPEN_AVAILABILITY:
+            is_member_only = False
+            signal = Signal.METADATA
+            self.logger.info(f"Video {video_id}: Free ({metadata_availability})")
+        elif is_free:
+            is_member_only = False
+            signal = Signal.TITLE
+            self.logger.info(f"Video {video_id}: Detected as limited-time free from title (rule {matched_rule!r})")
+        else:
+            is_member_only = True
+            signal = Signal.TITLE
+            if matched_rule:
+                self.logger.info(f"Video {video_id}: Member-only (excluded by rule {matched_rule!r})")
+            else:
+                self.logger.info(f"Video {video_id}: Assumed member-only (no free rule matched the title)")
+        
+        live_status = entry.get('live_status')
+        return VideoRecord(
+            position,
+            video_id,
+            video_title,
+            is_member_only,
+            checked_at,
+            matched_rule,
+            metadata_availability,
+            int(duration) if isinstance(duration, (int, float)) else None,
+            sys.intern(live_status) if isinstance(live_status, str) else None,
+            signal,
+        )
+    
+    def _opened_by_metadata(self, prev_video: VideoRecord, curr_video: VideoRecord) -> bool:
+        """Whether a video without a badge is known to have lost its members-only badge"""
+        if curr_video.signal != Signal.TITLE or curr_video.matched_rule \
+                or curr_video.metadata_availability is not None:
+            return False
+        # Either the badge just went away, or it went away on an earlier check
+        return (prev_video.metadata_availability in GATED_AVAILABILITY
+                or (prev_video.signal == Signal.METADATA and not prev_video.is_member_only))
+    
+    def _playlist_data(self, info: Dict, videos: List[VideoRecord], monitored_at: str) -> Dict:
+        """Build the playlist state from extracted playlist info and processed videos"""
+        return {
+            'playlist_id': info.get('id'),
+            'playlist_title': info.get('title'),
+            # Taken from the playlist header, not the fetched entries
+            'total_videos': info.get('playlist_count'),
+            'monitored_at': monitored_at,
+            'videos': videos
+        }
+    
+    def fetch_playlist_videos(self) -> Optional[Dict]:
+        """Fetch the first `window_size` videos from playlist using yt-dlp"""
+        with metrics.stage('fetch') as stage:
+            try:
+                self.logger.info(f"Fetching playlist: {self.playlist_url}")
+                
+                start = time.monotonic()
+                info, entries = self._iter_playlist_entries()
                 
                 if not info:
+                    stage.fail()
                     self.logger.error("Failed to extract playlist info")
                     return None
                 
-                # Get first 3 videos only
-                videos = info.get('entries', [])[:3]
+                # Only the monitored window is pulled, so later pages are never requested
+                monitored_at = datetime.now().isoformat()
+                videos = list(self._classify(islice(entries, self.window_size), monitored_at))
+                playlist_data = self._playlist_data(info, videos, monitored_at)
+                self.logger.info(f"Extracted playlist in {time.monotonic() - start:.2f}s")
                 
-                playlist_data = {
-                    'playlist_id': info.get('id'),
-                    'playlist_title': info.get('title'),
-                    'total_videos': len(info.get('entries', [])),
-                    'monitored_at': datetime.now().isoformat(),
-                    'videos': []
-                }
+                self.logger.info(f"Successfully fetched {len(videos)} videos")
+                return playlist_data
+            
+            except HostThrottled as e:
+                # Nothing wrong with the session: the next cycle retries once the backoff is over
+                stage.fail()
+                self.logger.warning(f"🚦 Skipping playlist fetch: {e}")
+                return None
+            except Exception as e:
+                stage.fail()
+                self.logger.error(f"Error fetching playlist: {e}")
+                # Don't reuse a session that may be in a bad state
+                self.close_session()
+                return None
+    
+    def _iter_playlist_entries(self) -> Tuple[Optional[Dict], Iterator[Dict]]:
+        """Extract the playlist without processing it, so entries are paged in lazily as consumed"""
+        ydl = self._get_session()
+        info = ydl.extract_info(self.playlist_url, download=False, process=False)
+        # Some playlist URLs first resolve to the canonical playlist page
+        for _ in range(MAX_URL_REDIRECTS):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        if not info:
+            return None, iter(())
+        return info, (entry for entry in (info.get('entries') or []) if entry)
+    
+    def _full_rescan_reason(self, previous_state: Optional[Dict]) -> Optional[str]:
+        """Return why the next incremental scan must walk the whole playlist, or None"""
+        if not previous_state or not previous_state.get('watermark'):
+            return "no watermark in previous state"
+        
+        last_full_scan_at = previous_state.get('last_full_scan_at')
+        if not last_full_scan_at:
+            return "no previous full scan"
+        
+        if datetime.now() - datetime.fromisoformat(last_full_scan_at) >= timedelta(hours=self.full_rescan_hours):
+            return f"scheduled full rescan (every {self.full_rescan_hours}h)"
+        
+        return None
+    
+    # The scan is a chain of generators (entries → classify → diff → emit), each pulling
+    # from the one before, so a page of entries is classified, compared and its changes
+    # handed to the outbox before the next page is requested.
+    
+    def _classify(self, entries: Iterable[Dict], checked_at: str) -> Iterator[VideoRecord]:
+        """Pipeline stage: build a record for every entry as it is paged in"""
+        for position, entry in enumerate(entries, 1):
+            yield self._build_video(entry, position, checked_at)
+    
+    def _scan_until_watermark(self, entries: Iterable[Dict], previous_state: Dict,
+                              checked_at: str) -> Iterator[Tuple[VideoRecord, bool]]:
+        """Pipeline stage: classify entries until a run of known, unchanged watermark videos is reached.
+        
+        Yields every video in its new order with whether it is new or changed; known,
+        unchanged videos are carried over from the previous state. Raises
+        WatermarkMismatch if the playlist ordering is inconsistent with the watermark.
+        """
+        prev_videos = previous_state.get('videos', [])
+        prev_index = {v.id: i for i, v in enumerate(prev_videos)}
+        watermark = set(previous_state['watermark'])
+        # Consecutive unchanged known videos required before trusting the tail
+        confirm = min(WATERMARK_CONFIRM_RUN, len(watermark))
+        
+        delta = 0
+        run = 0
+        last_prev_pos = None
+        for position, entry in enumerate(entries, 1):
+            video_id = entry.get('id')
+            
+            if video_id in prev_index:
+                # The first known video must be from the watermark, and known videos
+                # must keep their previous relative order
+                prev_pos = prev_index[video_id]
+                if (last_prev_pos is None and video_id not in watermark) or \
+                        (last_prev_pos is not None and prev_pos <= last_prev_pos):
+                    raise WatermarkMismatch(f"Video {video_id} is out of watermark order")
                 
-                # Process each video using only title information
-                for i, video in enumerate(videos, 1):
-                    if not video:
-                        continue
-                        
-                    video_id = video.get('id')
-                    video_title = video.get('title')
-                    video_url = f"https://www.youtube.com/watch?v={video_id}"
+                prev_video = prev_videos[prev_pos]
+                # Videos held back by verification are re-checked until they really open up
+                if prev_video.title == entry.get('title') and prev_video.verified != 'member_only' \
+                        and prev_video.metadata_availability == normalise_availability(entry.get('availability')):
+                    run = run + 1 if last_prev_pos is not None and prev_pos == last_prev_pos + 1 else 1
+                    last_prev_pos = prev_pos
+                    # Records of the previous state are carried over rather than copied
+                    prev_video.position = position
+                    yield prev_video, False
                     
-                    self.logger.info(f"Processing video {i}: {video_title}")
+                    if run == confirm:
+                        self.logger.info(
+                            f"Reached watermark at video {video_id} after {delta} new/changed entries"
+                        )
+                        # The rest of the playlist is unchanged since the previous scan
+                        for prev_video in prev_videos[prev_pos + 1:]:
+                            yield prev_video, False
+                        return
+                    continue
+                last_prev_pos = prev_pos
+            
+            run = 0
+            delta += 1
+            yield self._build_video(entry, position, checked_at), True
+    
+    @staticmethod
+    def _unique(scanned: Iterable[Tuple[VideoRecord, bool]]) -> Iterator[Tuple[VideoRecord, bool]]:
+        """Pipeline stage: drop videos listed more than once and renumber positions"""
+        seen = set()
+        for video, changed in scanned:
+            if video.id in seen:
+                continue
+            seen.add(video.id)
+            video.position = len(seen)
+            yield video, changed
+    
+    def _diff(self, scanned: Iterable[Tuple[VideoRecord, bool]], previous_state: Optional[Dict],
+              playlist_title: Optional[str]) -> Iterator[Tuple[VideoRecord, Optional[ChangeEvent]]]:
+        """Pipeline stage: compare new or changed videos with their previous records.
+        
+        Previous records are looked up a batch at a time. Only the time spent here,
+        not waiting for upstream pages, is reported as the 'detect' stage.
+        """
+        if not previous_state:
+            self.logger.info("No previous state to compare - skipping change detection")
+            for video, _ in scanned:
+                yield video, None
+            return
+        
+        detected_at = datetime.now().isoformat()
+        since = previous_state.get('monitored_at')
+        elapsed = None
+        try:
+            for batch in _batched(scanned, DIFF_BATCH_SIZE):
+                video_ids = [video.id for video, changed in batch if changed]
+                if not video_ids:
+                    yield from ((video, None) for video, _ in batch)
+                    continue
+                
+                start = time.perf_counter()
+                prev_videos = self.state_store.lookup_videos(previous_state, video_ids)
+                diffed = [
+                    (video, self._compare(prev_videos.get(video.id), video, playlist_title, detected_at, since)
+                     if changed else None)
+                    for video, changed in batch
+                ]
+                elapsed = (elapsed or 0.0) + time.perf_counter() - start
+                yield from diffed
+        finally:
+            # Scans that only carried over known videos didn't compare anything
+            if elapsed is not None:
+                metrics.observe('detect', elapsed)
+    
+    def _compare(self, prev_video, curr_video: VideoRecord, playlist_title: Optional[str],
+                 detected_at: str, since: Optional[str] = None) -> Optional[ChangeEvent]:
+        """The member-only → free change of one video, if it has one"""
+        video_id = curr_video.id
+        if not prev_video:
+            # New video detected - check if it's free
+            self.logger.info(f"New video detected: {curr_video.title}")
+            if curr_video.is_member_only:
+                return None
+            self.logger.info(f"🎉 New free video detected: {curr_video.title}")
+            return ChangeEvent(
+                ChangeType.NEW_FREE_VIDEO, video_id, curr_video.title,
+                Availability.NOT_EXISTED, curr_video.availability, playlist_title, detected_at,
+                previous_checked_at=since
+            )
+        
+        # Stores that look records up themselves return them in their stored form
+        prev_video = as_record(prev_video)
+        
+        # A dropped members-only badge means the video opened up, whatever the title says
+        if curr_video.is_member_only and self._opened_by_metadata(prev_video, curr_video):
+            curr_video.is_member_only = False
+            curr_video.signal = Signal.METADATA
+            self.logger.info(f"Video {video_id}: Members-only badge removed")
+        
+        # Check for member-only → free change
+        if prev_video.is_member_only and not curr_video.is_member_only:
+            self.logger.info(f"🎉 Video became free: {curr_video.title}")
+            return ChangeEvent(
+                ChangeType.MEMBER_TO_FREE, video_id, curr_video.title,
+                prev_video.availability, curr_video.availability, playlist_title, detected_at,
+                previous_checked_at=since
+            )
+        return None
+    
+    def _emit(self, diffed: Iterable[Tuple[VideoRecord, Optional[ChangeEvent]]]) -> Iterator[Tuple[VideoRecord, Optional[Dict]]]:
+        """Pipeline stage: verify each batch of changes and hand the confirmed ones to the outbox.
+        
+        Changes reach the outbox, and from there the delivery worker, while later
+        pages are still being fetched; a failing outbox write aborts the scan.
+        """
+        for batch in _batched(diffed, DIFF_BATCH_SIZE):
+            changes = [change for _, change in batch if change]
+            if not changes:
+                for video, _ in batch:
+                    yield video, None
+                continue
+            
+            confirmed = {
+                change.video_id: change.to_dict()
+                for change in self.verify_changes(changes, [video for video, change in batch if change])
+            }
+            if confirmed and self.outbox:
+                try:
+                    self.outbox.add(list(confirmed.values()), self.playlist_url)
+                except Exception as e:
+                    self.logger.error(f"Error writing changes to the outbox, keeping previous state: {e}")
+                    raise
+            for video, _ in batch:
+                yield video, confirmed.get(video.id)
+    
+    def _merge_diff(self, scanned: Iterable[Tuple[VideoRecord, bool]], previous_state: Optional[Dict],
+                    playlist_title: Optional[str],
+                    transitions: List[ChangeEvent]) -> Iterator[Tuple[VideoRecord, Optional[ChangeEvent]]]:
+        """Pipeline stage: diff every video against the previous state in one pass.
+        
+        Current videos are matched to previous records by id as they stream by.
+        The change to notify (member-only → free, new free video) is yielded with
+        each video; every other transition (free → member-only, renamed, removed,
+        moved) is appended to `transitions`, removals and moves once the whole
+        playlist has been seen. The time spent here is reported as 'detect'.
+        """
+        if not previous_state:
+            self.logger.info("No previous state to compare - skipping change detection")
+            for video, _ in scanned:
+                yield video, None
+            return
+        
+        start = time.perf_counter()
+        detected_at = datetime.now().isoformat()
+        since = previous_state.get('monitored_at')
+        prev_videos = previous_state.get('videos', [])
+        prev_index = {video.id: i for i, video in enumerate(prev_videos)}
+        # Previous index and current record of each video still listed, in the new order
+        kept = []
+        elapsed = time.perf_counter() - start
+        try:
+            for batch in _batched(scanned, DIFF_BATCH_SIZE):
+                start = time.perf_counter()
+                diffed = []
+                for video, _ in batch:
+                    i = prev_index.get(video.id)
+                    prev_video = prev_videos[i] if i is not None else None
+                    diffed.append((video, self._compare(prev_video, video, playlist_title, detected_at, since)))
+                    if prev_video is not None:
+                        kept.append((i, video))
+                        self._transitions(prev_video, video, playlist_title, detected_at, transitions)
+                elapsed += time.perf_counter() - start
+                yield from diffed
+            
+            start = time.perf_counter()
+            listed = bytearray(len(prev_videos))
+            for i, _ in kept:
+                listed[i] = 1
+            for i, prev_video in enumerate(prev_videos):
+                if not listed[i]:
+                    self.logger.info(f"🗑️ Video removed from playlist: {prev_video.title}")
+                    transitions.append(ChangeEvent(
+                        ChangeType.REMOVED, prev_video.id, prev_video.title,
+                        prev_video.availability, Availability.NOT_EXISTED, playlist_title, detected_at
+                    ))
+            for k in _moved([i for i, _ in kept]):
+                i, video = kept[k]
+                self.logger.info(f"↕️ Video moved from position {prev_videos[i].position} to {video.position}: {video.title}")
+                transitions.append(ChangeEvent(
+                    ChangeType.REORDERED, video.id, video.title, video.availability, video.availability,
+                    playlist_title, detected_at, f"{prev_videos[i].position} → {video.position}"
+                ))
+            elapsed += time.perf_counter() - start
+            
+            if transitions:
+                counts = Counter(change.type.value for change in transitions)
+                self.logger.info(f"Other transitions: {', '.join(f'{n} {kind}' for kind, n in sorted(counts.items()))}")
+        finally:
+            metrics.observe('detect', elapsed)
+    
+    def _transitions(self, prev_video: VideoRecord, curr_video: VideoRecord, playlist_title: Optional[str],
+                     detected_at: str, transitions: List[ChangeEvent]):
+        """Append the transitions of one video that aren't notified"""
+        if not prev_video.is_member_only and curr_video.is_member_only:
+            self.logger.info(f"🔒 Video is member-only again: {curr_video.title}")
+            transitions.append(ChangeEvent(
+                ChangeType.FREE_TO_MEMBER, curr_video.id, curr_video.title,
+                prev_video.availability, curr_video.availability, playlist_title, detected_at
+            ))
+        if prev_video.title != curr_video.title:
+            self.logger.info(f"✏️ Video renamed from {prev_video.title!r} to {curr_video.title!r}")
+            transitions.append(ChangeEvent(
+                ChangeType.TITLE_CHANGED, curr_video.id, curr_video.title,
+                prev_video.availability, curr_video.availability, playlist_title, detected_at,
+                prev_video.title
+            ))
+    
+    def scan_playlist(self, previous_state: Optional[Dict]) -> Optional[Tuple[Dict, List[Dict], List[ChangeEvent]]]:
+        """Scan the playlist beyond the head (incremental and full scan modes).
+        
+        Incremental scans page only until the stored watermark is reached; full
+        scans walk every entry and diff the whole playlist. Returns the merged
+        state covering the whole playlist, the confirmed changes (already in the
+        outbox) and, for full scans, the transitions that aren't notified.
+        """
+        with metrics.stage('fetch') as stage:
+            try:
+                self.logger.info(f"Scanning playlist ({self.scan_mode}): {self.playlist_url}")
+                start = time.monotonic()
+                monitored_at = datetime.now().isoformat()
+                
+                full = self.scan_mode == 'full'
+                reason = None if full else self._full_rescan_reason(previous_state)
+                while True:
+                    info, entries = self._iter_playlist_entries()
+                    if not info:
+                        stage.fail()
+                        self.logger.error("Failed to extract playlist info")
+                        return None
                     
-                    # Determine status based on title only
-                    if '限免' in video_title:
-                        is_member_only = False
-                        availability = 'limited_free'
-                        self.logger.info(f"Video {video_id}: Detected as limited-time free from title")
+                    if full:
+                        scanned = ((video, True) for video in self._classify(entries, monitored_at))
+                    elif reason is None:
+                        scanned = self._scan_until_watermark(entries, previous_state, monitored_at)
                     else:
-                        is_member_only = True
-                        availability = 'member_only'
-                        self.logger.info(f"Video {video_id}: Assumed member-only (no '限免' in title)")
+                        self.logger.info(f"Full rescan: {reason}")
+                        scanned = ((video, True) for video in self._classify(entries, monitored_at))
                     
-                    playlist_data['videos'].append({
-                        'position': i,
-                        'id': video_id,
-                        'title': video_title,
-                        'url': video_url,
-                        'is_member_only': is_member_only,
-                        'availability': availability,
-                        'error_message': None,
-                        'checked_at': datetime.now().isoformat()
-                    })
+                    videos = []
+                    changes = []
+                    transitions = []
+                    try:
+                        if full:
+                            diffed = self._merge_diff(self._unique(scanned), previous_state, info.get('title'), transitions)
+                        else:
+                            diffed = self._diff(self._unique(scanned), previous_state, info.get('title'))
+                        for video, change in self._emit(diffed):
+                            videos.append(video)
+                            if change:
+                                changes.append(change)
+                    except WatermarkMismatch as e:
+                        # Changes already handed over are ignored by the outbox when found again
+                        self.logger.info(str(e))
+                        reason = "playlist ordering inconsistent with watermark"
+                        continue
+                    break
                 
-                self.logger.info(f"Successfully fetched {len(playlist_data['videos'])} videos")
-                return playlist_data
+                current_state = self._playlist_data(info, videos, monitored_at)
+                if not full:
+                    current_state['last_full_scan_at'] = (
+                        monitored_at if reason is not None else previous_state['last_full_scan_at']
+                    )
+                    current_state['watermark'] = [v.id for v in videos[:self.watermark_size]]
                 
-        except Exception as e:
-            self.logger.error(f"Error fetching playlist: {e}")
-            return None
-    
+                self.logger.info(
+                    f"Scanned {len(videos)} tracked videos with {len(changes)} changes "
+                    f"in {time.monotonic() - start:.2f}s"
+                )
+                return current_state, changes, transitions
+            
+            except HostThrottled as e:
+                stage.fail()
+                self.logger.warning(f"🚦 Skipping playlist scan: {e}")
+                return None
+            except Exception as e:
+                stage.fail()
+                self.logger.error(f"Error scanning playlist: {e}")
+                self.close_session()
+                return None
     
     def load_previous_state(self) -> Optional[Dict]:
-        """Load previous monitoring state from file"""
-        if not os.path.exists(self.state_file):
-            self.logger.info("No previous state file found")
-            return None
-            
-        try:
-            with open(self.state_file, 'r') as f:
-                data = json.load(f)
-                self.logger.info(f"Loaded previous state with {len(data.get('videos', []))} videos")
-                return data
-        except Exception as e:
-            self.logger.error(f"Error loading previous state: {e}")
-            return None
+        """Load previous monitoring state from the state store"""
+        with metrics.stage('load') as stage:
+            try:
+                data = self.state_store.load()
+                if data is None:
+                    self.logger.info("No previous state found")
+                    return None
+                
+                state = state_from_dict(data)
+                self.logger.info(f"Loaded previous state with {len(state['videos'])} videos")
+                return state
+            except Exception as e:
+                stage.fail()
+                self.logger.error(f"Error loading previous state: {e}")
+                return None
     
     def save_current_state(self, playlist_data: Dict) -> bool:
-        """Save current monitoring state to file"""
-        try:
-            with open(self.state_file, 'w') as f:
-                json.dump(playlist_data, f, indent=2)
-            self.logger.info(f"Saved current state to {self.state_file}")
-            return True
-        except Exception as e:
-            self.logger.error(f"Error saving state: {e}")
-            return False
+        """Save current monitoring state to the state store"""
+        with metrics.stage('save') as stage:
+            try:
+                self.state_store.save(state_to_dict(playlist_data))
+                self.logger.info(f"Saved current state to {self.state_store.description}")
+                return True
+            except Exception as e:
+                stage.fail()
+                self.logger.error(f"Error saving state: {e}")
+                return False
     
-    def detect_changes(self, previous_state: Dict, current_state: Dict) -> List[Dict]:
+    def detect_changes(self, previous_state: Dict, current_state: Dict) -> List[ChangeEvent]:
         """Detect videos that changed from member-only to free"""
-        changes = []
+        if not current_state:
+            self.logger.info("No current state to compare - skipping change detection")
+            return []
         
-        if not previous_state or not current_state:
-            self.logger.info("No previous state to compare - skipping change detection")
+        scanned = ((video, True) for video in current_state.get('videos', []))
+        changes = [
+            change
+            for _, change in self._diff(scanned, previous_state, current_state.get('playlist_title'))
+            if change
+        ]
+        self.logger.info(f"Detected {len(changes)} changes")
+        return changes
+    
+    def verify_changes(self, changes: List[ChangeEvent], videos: Iterable[VideoRecord]) -> List[ChangeEvent]:
+        """Drop changes whose video turns out to still be member-only.
+        
+        Verdicts are written to the matching records in `videos`; held-back videos
+        are marked member-only so they are re-verified on later cycles.
+        """
+        if not changes or not self.verifier:
             return changes
         
-        # Create lookup for previous videos
-        prev_videos = {v['id']: v for v in previous_state.get('videos', [])}
-        curr_videos = {v['id']: v for v in current_state.get('videos', [])}
+        verdicts = self.verifier.verify([change.video_id for change in changes])
+        for video in videos:
+            verdict = verdicts.get(video.id)
+            if verdict:
+                video.verified = verdict
+            if verdict == 'member_only':
+                video.is_member_only = True
         
-        for video_id, curr_video in curr_videos.items():
-            prev_video = prev_videos.get(video_id)
-            
-            if not prev_video:
-                # New video detected - check if it's free
-                self.logger.info(f"New video detected: {curr_video['title']}")
-                if not curr_video['is_member_only']:
-                    change = {
-                        'type': 'new_free_video',
-                        'video_id': video_id,
-                        'title': curr_video['title'],
-                        'url': curr_video['url'],
-                        'previous_status': 'not_existed',
-                        'current_status': curr_video['availability'],
-                        'detected_at': datetime.now().isoformat()
-                    }
-                    changes.append(change)
-                    self.logger.info(f"🎉 New free video detected: {curr_video['title']}")
-                continue
-            
-            # Check for member-only → free change
-            if (prev_video['is_member_only'] and not curr_video['is_member_only']):
-                change = {
-                    'type': 'member_to_free',
-                    'video_id': video_id,
-                    'title': curr_video['title'],
-                    'url': curr_video['url'],
-                    'previous_status': prev_video['availability'],
-                    'current_status': curr_video['availability'],
-                    'detected_at': datetime.now().isoformat()
-                }
-                changes.append(change)
-                self.logger.info(f"🎉 Video became free: {curr_video['title']}")
+        confirmed = []
+        for change in changes:
+            if verdicts.get(change.video_id) == 'member_only':
+                self.logger.info(f"Video {change.video_id}: Title says free but still member-only, holding back")
+            else:
+                confirmed.append(change)
+        return confirmed
+    
+    def _fingerprint(self, state: Dict) -> str:
+        """Stable hash of the ordered ids, titles and statuses of the monitored videos"""
+        digest = hashlib.sha256()
+        for video in state.get('videos', []):
+            digest.update('\x1f'.join(str(getattr(video, field)) for field in FINGERPRINT_FIELDS).encode('utf-8'))
+            digest.update(b'\x1e')
+        return digest.hexdigest()
+    
+    def _read_marker(self) -> Optional[Dict]:
+        """Read the last-checked marker, or None if there isn't a usable one"""
+        if not self.state_store.marker_file:
+            return None
+        try:
+            with open(self.state_store.marker_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _touch_marker(self, fingerprint: str, checked_at: str, recheck: bool):
+        """Record when the playlist was last checked and what it looked like"""
+        if not self.state_store.marker_file:
+            return
+        with metrics.stage('mark') as stage:
+            try:
+                write_json_atomic(self.state_store.marker_file, {
+                    'fingerprint': fingerprint,
+                    'checked_at': checked_at,
+                    # Videos held back by verification must be looked at again
+                    'recheck': recheck,
+                })
+            except OSError as e:
+                stage.fail()
+                self.logger.warning(f"Error writing last-checked marker: {e}")
+    
+    def _unchanged(self, fingerprint: str, previous_state: Optional[Dict], current_state: Dict) -> bool:
+        """Whether the fetched playlist is exactly what the previous cycle saved"""
+        if previous_state is not None:
+            return (previous_state.get('fingerprint') == fingerprint
+                    and previous_state.get('last_full_scan_at') == current_state.get('last_full_scan_at')
+                    and not any(v.verified == 'member_only' for v in previous_state.get('videos', [])))
         
-        self.logger.info(f"Detected {len(changes)} changes")
-        return changes
+        marker = self._read_marker()
+        return bool(marker) and marker.get('fingerprint') == fingerprint and not marker.get('recheck')
+    
+    def _record_history(self, checked_at: str, videos: Optional[List[VideoRecord]] = None,
+                        changes: Iterable[Dict] = ()):
+        """Add what this check saw to the history timeline, if one is kept"""
+        if not self.history:
+            return
+        with metrics.stage('history'):
+            # A head scan only sees the window; videos that left it weren't removed
+            self.history.record_check(self.playlist_url, checked_at, videos, changes,
+                                      complete=self.scan_mode != 'head')
     
     def monitor_once(self) -> List[Dict]:
         """Perform one monitoring cycle and return any changes"""
         self.logger.info("Starting monitoring cycle")
         
-        # Fetch current state
-        current_state = self.fetch_playlist_videos()
+        # Incremental and full scans need the previous state first (for the watermark and
+        # the diff), and detect (and hand over) changes while they page through the playlist
+        if self.scan_mode != 'head':
+            previous_state = self.load_previous_state()
+            scanned = self.scan_playlist(previous_state)
+            current_state, changes, transitions = scanned if scanned else (None, None, None)
+        else:
+            previous_state = changes = None
+            transitions = []
+            current_state = self.fetch_playlist_videos()
+        
         if not current_state:
             self.logger.error("Failed to fetch current playlist state")
             return []
         
-        # Load previous state
-        previous_state = self.load_previous_state()
+        # Nothing changed since the last cycle: skip the diff and the state write
+        fingerprint = self._fingerprint(current_state)
+        current_state['fingerprint'] = fingerprint
+        if previous_state is None and not self.state_store.marker_file:
+            # Without a marker the fingerprint has to come from the saved state
+            previous_state = self.load_previous_state()
+        if not changes and self._unchanged(fingerprint, previous_state, current_state):
+            self.logger.info("Playlist unchanged since last check - skipping change detection and state save")
+            self._touch_marker(fingerprint, current_state['monitored_at'], recheck=False)
+            # Head scans pass their (small) window, so only the videos in it count as seen again
+            self._record_history(current_state['monitored_at'],
+                                 current_state['videos'] if self.scan_mode == 'head' else None)
+            return []
         
-        # Detect changes
-        changes = self.detect_changes(previous_state, current_state)
+        if changes is None:
+            if previous_state is None:
+                previous_state = self.load_previous_state()
+            
+            # Detect changes
+            changes = self.detect_changes(previous_state, current_state)
+            
+            # Confirm candidate transitions against the videos themselves
+            changes = self.verify_changes(changes, current_state['videos'])
+            
+            # Delivered (and persisted in the outbox) in their plain dict form
+            changes = [change.to_dict() for change in changes]
+            
+            # Persist changes for delivery before the state moves past them
+            if changes and self.outbox:
+                try:
+                    self.outbox.add(changes, self.playlist_url)
+                except Exception as e:
+                    self.logger.error(f"Error writing changes to the outbox, keeping previous state: {e}")
+                    return []
         
         # Save current state
-        self.save_current_state(current_state)
+        if self.save_current_state(current_state):
+            recheck = any(v.verified == 'member_only' for v in current_state.get('videos', []))
+            self._touch_marker(fingerprint, current_state['monitored_at'], recheck)
+        
+        self._record_history(
+            current_state['monitored_at'], current_state['videos'],
+            changes + [transition.to_dict() for transition in transitions]
+        )
         
         self.logger.info("Monitoring cycle completed")
         return changes
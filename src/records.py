@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Compact records for playlist videos and detected changes
+"""
+
+import sys
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Dict, Optional
+
+VIDEO_URL = "https://www.youtube.com/watch?v={}"
+
+class Availability(StrEnum):
+    MEMBER_ONLY = 'member_only'
+    LIMITED_FREE = 'limited_free'
+    # Previous status of a video that wasn't in the playlist yet, or current
+    # status of one that was removed from it
+    NOT_EXISTED = 'not_existed'
+
+class Signal(StrEnum):
+    """What decided a video's status"""
+    METADATA = 'metadata'
+    TITLE = 'title'
+
+class ChangeType(StrEnum):
+    NEW_FREE_VIDEO = 'new_free_video'
+    MEMBER_TO_FREE = 'member_to_free'
+    # Only reported by full scans, and not notified
+    FREE_TO_MEMBER = 'free_to_member'
+    TITLE_CHANGED = 'title_changed'
+    REMOVED = 'removed'
+    REORDERED = 'reordered'
+
+# Enum lookups by value without going through Enum.__call__
+_SIGNALS = {signal.value: signal for signal in Signal}
+
+# One shared copy of each value of the small-vocabulary fields (rules, badges, live
+# status, verdicts); `_shared(value, value)` returns the canonical copy
+_shared = {}.setdefault
+
+@dataclass(slots=True)
+class VideoRecord:
+    """One playlist video as of the last check.
+
+    The url and availability are derived from the id and status rather than
+    stored, and string fields shared by many videos are interned, so a record
+    costs little more than its title.
+    """
+    position: Optional[int]
+    id: str
+    title: Optional[str]
+    is_member_only: bool
+    # Shared by every video built in the same cycle
+    checked_at: Optional[str]
+    matched_rule: Optional[str] = None
+    metadata_availability: Optional[str] = None
+    duration: Optional[int] = None
+    live_status: Optional[str] = None
+    signal: Optional[Signal] = None
+    # Verdict of the availability verifier ('free' / 'member_only'), if it ran
+    verified: Optional[str] = None
+    
+    @property
+    def url(self) -> str:
+        return VIDEO_URL.format(self.id)
+    
+    @property
+    def availability(self) -> Availability:
+        return Availability.MEMBER_ONLY if self.is_member_only else Availability.LIMITED_FREE
+    
+    def to_dict(self) -> Dict:
+        """The record in the state store format"""
+        video = {
+            'position': self.position,
+            'id': self.id,
+            'title': self.title,
+            'url': VIDEO_URL.format(self.id),
+            'is_member_only': self.is_member_only,
+            'availability': 'member_only' if self.is_member_only else 'limited_free',
+            'matched_rule': self.matched_rule,
+            'metadata_availability': self.metadata_availability,
+            'duration': self.duration,
+            'live_status': self.live_status,
+            'signal': self.signal and self.signal.value,
+            'error_message': None,
+            'checked_at': self.checked_at,
+        }
+        if self.verified is not None:
+            video['verified'] = self.verified
+        return video
+    
+    @classmethod
+    def from_dict(cls, video: Dict) -> 'VideoRecord':
+        """Rebuild a record from the state store format (older states lack the newer fields)"""
+        get = video.get
+        checked_at = get('checked_at')
+        matched_rule = get('matched_rule')
+        metadata_availability = get('metadata_availability')
+        live_status = get('live_status')
+        verified = get('verified')
+        return cls(
+            get('position'),
+            video['id'],
+            get('title'),
+            bool(get('is_member_only')),
+            # Every video checked in the same cycle has the same timestamp
+            sys.intern(checked_at) if checked_at else checked_at,
+            _shared(matched_rule, matched_rule),
+            _shared(metadata_availability, metadata_availability),
+            get('duration'),
+            _shared(live_status, live_status),
+            _SIGNALS.get(get('signal')),
+            _shared(verified, verified),
+        )
+
+def as_record(video) -> VideoRecord:
+    """A VideoRecord for either a record or a stored dict"""
+    return video if type(video) is VideoRecord else VideoRecord.from_dict(video)
+
+def state_to_dict(state: Dict) -> Dict:
+    """Playlist state with its video records in the state store format"""
+    return dict(state, videos=[video.to_dict() for video in state.get('videos', [])])
+
+def state_from_dict(data: Dict) -> Dict:
+    """Playlist state loaded from a state store, with its videos as records"""
+    return dict(data, videos=[VideoRecord.from_dict(video) for video in data.get('videos', [])])
+
+@dataclass(frozen=True, slots=True)
+class ChangeEvent:
+    """A status transition found by change detection"""
+    type: ChangeType
+    video_id: str
+    title: Optional[str]
+    previous_status: Availability
+    current_status: Availability
+    playlist_title: Optional[str]
+    # Shared by every change detected in the same cycle
+    detected_at: str
+    # The previous title of a renamed video, or the old → new position of a moved one
+    detail: Optional[str] = None
+    # When the state the change was detected against was checked: re-detections of the
+    # same transition share it, a later repeat (free, members-only, free again) doesn't
+    previous_checked_at: Optional[str] = None
+    
+    @property
+    def url(self) -> str:
+        return VIDEO_URL.format(self.video_id)
+    
+    def to_dict(self) -> Dict:
+        """The change as delivered to the outbox and notifications"""
+        change = {
+            'type': self.type.value,
+            'video_id': self.video_id,
+            'title': self.title,
+            'url': VIDEO_URL.format(self.video_id),
+            'previous_status': self.previous_status.value,
+            'current_status': self.current_status.value,
+            'playlist_title': self.playlist_title,
+            'detected_at': self.detected_at,
+        }
+        if self.detail is not None:
+            change['detail'] = self.detail
+        if self.previous_checked_at is not None:
+            change['previous_checked_at'] = self.previous_checked_at
+        return change
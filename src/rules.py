@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Compiled title rules for free/member-only classification
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Sequence
+
+# Matches what the monitor has always looked for, plus common spellings
+DEFAULT_FREE_RULES = ('会员限免', '限免', '限时免费')
+
+# Simplified/traditional pairs that show up in free-video titles
+CHARACTER_VARIANTS = {
+    '会': '會', '员': '員', '时': '時', '费': '費', '间': '間', '开': '開',
+    '观': '觀', '体': '體', '验': '驗',
+}
+
+# yt-dlp `availability` values (flat entries get them from badges)
+GATED_AVAILABILITY = ('subscriber_only', 'premium_only', 'needs_auth', 'private')
+OPEN_AVAILABILITY = ('public', 'unlisted')
+_KNOWN_AVAILABILITY = {value: value for value in GATED_AVAILABILITY + OPEN_AVAILABILITY}
+
+def normalise_availability(value) -> Optional[str]:
+    """Lower-case a yt-dlp availability value, or None if it isn't a known one"""
+    if not isinstance(value, str):
+        return None
+    # The shared constant, so video records don't each keep their own copy
+    return _KNOWN_AVAILABILITY.get(value.strip().lower())
+
+class Classification(NamedTuple):
+    is_free: bool
+    # The rule that decided the result, None when nothing matched
+    rule: Optional[str]
+
+def _variant_pattern(keyword: str) -> str:
+    """Regex for a keyword that also matches its simplified/traditional spellings"""
+    variants = {**CHARACTER_VARIANTS, **{v: k for k, v in CHARACTER_VARIANTS.items()}}
+    parts = []
+    for char in keyword:
+        other = variants.get(char)
+        parts.append(f"[{char}{other}]" if other else re.escape(char))
+    return ''.join(parts)
+
+class RuleSet:
+    """Title rules for one playlist, compiled into a single regex.
+
+    Each rule is a keyword (matched in any simplified/traditional spelling),
+    `re:<pattern>` for a regular expression, or either of those prefixed with
+    `!` to mark a title as member-only even when a free rule also matches.
+    Regular expressions with capturing groups of their own are matched on
+    their own, so their backreferences keep pointing at their own groups.
+    """
+    
+    def __init__(self, rules: Sequence[str] = DEFAULT_FREE_RULES):
+        if not rules:
+            raise ValueError("A rule set needs at least one rule")
+        
+        self.rules = list(rules)
+        negative, positive = [], []
+        # (index, regex) of the rules that can't share the combined pattern
+        self._separate = []
+        for index, rule in enumerate(self.rules):
+            negated = rule.startswith('!')
+            body = rule[1:] if negated else rule
+            if body.startswith('re:'):
+                pattern = body[3:]
+                try:
+                    regex = re.compile(pattern, re.IGNORECASE)
+                except re.error as e:
+                    raise ValueError(f"Invalid regex in rule {rule!r}: {e}")
+                if pattern and regex.groups:
+                    # Inside the combined pattern its groups would be renumbered
+                    self._separate.append((index, regex))
+                    continue
+            else:
+                pattern = _variant_pattern(body)
+            if not pattern:
+                raise ValueError(f"Empty rule: {rule!r}")
+            (negative if negated else positive).append(f"(?P<r{index}>{pattern})")
+        
+        self._negated = {i for i, rule in enumerate(self.rules) if rule.startswith('!')}
+        # Negations come first so they win when both start at the same place; the
+        # lookahead makes every position a candidate, so overlapping rules are
+        # still seen within the one scan
+        self.pattern = None
+        if negative or positive:
+            try:
+                self.pattern = re.compile(f"(?=(?:{'|'.join(negative + positive)}))", re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Invalid rule set {self.rules!r}: {e}")
+    
+    def classify(self, title: Optional[str]) -> Classification:
+        """Classify a title in one pass, reporting the rule that decided it"""
+        title = title or ''
+        # (position, rule index) of the earliest negated and free matches
+        negated = free = None
+        if self.pattern:
+            for match in self.pattern.finditer(title):
+                hit = (match.start(), int(match.lastgroup[1:]))
+                if hit[1] in self._negated:
+                    negated = hit
+                    break
+                if free is None:
+                    free = hit
+        for index, regex in self._separate:
+            match = regex.search(title)
+            if match:
+                hit = (match.start(), index)
+                if index in self._negated:
+                    negated = min(negated, hit) if negated else hit
+                else:
+                    free = min(free, hit) if free else hit
+        
+        if negated:
+            return Classification(False, self.rules[negated[1]])
+        if free is None:
+            return Classification(False, None)
+        return Classification(True, self.rules[free[1]])
+
+def parse_rules(value: str) -> List[str]:
+    """Split a comma-separated rule list"""
+    return [rule.strip() for rule in value.split(',') if rule.strip()]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Adaptive polling scheduler driven by observed release times
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from .state_store import write_json_atomic
+
+class AdaptiveScheduler:
+    """Chooses the delay before the next monitoring cycle.
+    
+    Detection timestamps are recorded to a history file. Hours of the day in
+    which transitions have clustered are polled at the minimum interval;
+    outside them the interval doubles after every quiet cycle, up to the
+    maximum, but never sleeps past the start of the next busy hour.
+    """
+    
+    def __init__(self, history_file: str, base_interval_minutes: float,
+                 min_interval_minutes: float, max_interval_minutes: float,
+                 backoff_factor: float = 2.0, min_detections: int = 5,
+                 lookback_days: int = 60, max_history: int = 1000):
+        self.history_file = history_file
+        self.base_interval_minutes = base_interval_minutes
+        self.min_interval_minutes = min_interval_minutes
+        self.max_interval_minutes = max_interval_minutes
+        self.backoff_factor = backoff_factor
+        self.min_detections = min_detections
+        self.lookback_days = lookback_days
+        self.max_history = max_history
+        self.quiet_cycles = 0
+        self.logger = self._setup_logger()
+        self.detections = self._load_history()
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the scheduler"""
+        logger = logging.getLogger("adaptive_scheduler")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def _load_history(self) -> List[datetime]:
+        """Load recorded detection timestamps"""
+        if not os.path.exists(self.history_file):
+            return []
+        
+        try:
+            with open(self.history_file, 'r') as f:
+                return [datetime.fromisoformat(ts) for ts in json.load(f)]
+        except Exception as e:
+            self.logger.error(f"Error loading detection history: {e}")
+            return []
+    
+    def record_detections(self, timestamps: List[str]):
+        """Record when transitions were detected"""
+        if not timestamps:
+            return
+        
+        self.detections.extend(datetime.fromisoformat(ts) for ts in timestamps)
+        self.detections = sorted(self.detections)[-self.max_history:]
+        try:
+            write_json_atomic(self.history_file, [ts.isoformat() for ts in self.detections], indent=2)
+        except OSError as e:
+            self.logger.error(f"Error saving detection history: {e}")
+    
+    def hot_hours(self, now: Optional[datetime] = None) -> Set[int]:
+        """Hours of the day in which transitions have clustered"""
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=self.lookback_days)
+        recent = [ts for ts in self.detections if ts >= cutoff]
+        if len(recent) < self.min_detections:
+            return set()
+        
+        counts = [0] * 24
+        for ts in recent:
+            counts[ts.hour] += 1
+        
+        # Smooth over neighbouring hours so a release at 19:58 also warms up 20:00
+        smoothed = [counts[(h - 1) % 24] + counts[h] + counts[(h + 1) % 24] for h in range(24)]
+        # Hot means at least twice as many detections as a uniform spread would give
+        threshold = 2 * 3 * len(recent) / 24
+        return {h for h in range(24) if smoothed[h] >= threshold}
+    
+    def _minutes_until_hot(self, now: datetime, hot: Set[int]) -> Optional[float]:
+        """Minutes until the next hot hour starts, or None if there are none"""
+        start_of_hour = now.replace(minute=0, second=0, microsecond=0)
+        for ahead in range(1, 25):
+            candidate = start_of_hour + timedelta(hours=ahead)
+            if candidate.hour in hot:
+                return (candidate - now).total_seconds() / 60
+        return None
+    
+    def next_interval(self, found_changes: bool, now: Optional[datetime] = None) -> float:
+        """Minutes to wait before the next cycle, given the outcome of the last one"""
+        now = now or datetime.now()
+        hot = self.hot_hours(now)
+        
+        if not hot:
+            # Not enough history to learn from yet - keep the fixed cadence
+            return self.base_interval_minutes
+        
+        if now.hour in hot:
+            self.quiet_cycles = 0
+            interval = self.min_interval_minutes
+            reason = "busy hour"
+        else:
+            self.quiet_cycles = 0 if found_changes else min(self.quiet_cycles + 1, 32)
+            interval = self.base_interval_minutes * self.backoff_factor ** self.quiet_cycles
+            reason = f"quiet for {self.quiet_cycles} cycle(s)"
+            
+            until_hot = self._minutes_until_hot(now, hot)
+            if until_hot is not None and until_hot < interval:
+                interval = until_hot
+                reason = "next busy hour"
+        
+        interval = max(self.min_interval_minutes, min(self.max_interval_minutes, interval))
+        self.logger.info(f"Next check in {interval:.1f} minutes ({reason})")
+        return interval
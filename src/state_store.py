@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Pluggable storage backends for playlist monitoring state
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Union
+
+# Top-level playlist fields stored in their own columns; anything else
+# (watermark, last_full_scan_at, ...) goes into the metadata JSON column
+PLAYLIST_COLUMNS = ('playlist_id', 'playlist_title', 'total_videos', 'monitored_at')
+
+# Video fields stored in their own columns; anything else goes into `extra`
+VIDEO_COLUMNS = ('position', 'title', 'url', 'is_member_only', 'availability',
+                 'error_message', 'checked_at')
+
+# Stay well below SQLite's host parameter limit
+SQLITE_MAX_PARAMS = 500
+
+# Fields that change every cycle without the video itself changing
+VOLATILE_VIDEO_FIELDS = ('checked_at',)
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_key TEXT PRIMARY KEY,
+    playlist_id TEXT,
+    playlist_title TEXT,
+    total_videos INTEGER,
+    monitored_at TEXT,
+    metadata TEXT
+);
+
+CREATE TABLE IF NOT EXISTS videos (
+    playlist_key TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    position INTEGER,
+    title TEXT,
+    url TEXT,
+    is_member_only INTEGER NOT NULL,
+    availability TEXT,
+    error_message TEXT,
+    checked_at TEXT,
+    extra TEXT,
+    PRIMARY KEY (playlist_key, video_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_videos_video_id ON videos (video_id);
+CREATE INDEX IF NOT EXISTS idx_videos_status ON videos (playlist_key, availability);
+CREATE INDEX IF NOT EXISTS idx_videos_position ON videos (playlist_key, position);
+"""
+
+def write_json_atomic(path: str, data: Union[Dict, List], indent: Optional[int] = None):
+    """Write JSON to a temporary file and atomically replace `path` with it"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        if indent is None:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class StateStore(ABC):
+    """Base class for playlist state backends.
+    
+    A store holds the state of a single playlist. State is the dict produced
+    by `PlaylistMonitor.fetch_playlist_videos`, with its video records in
+    their plain dict form (`records.state_to_dict`).
+    """
+    
+    description = "state store"
+    # Small sidecar file touched by cycles that found nothing to save (None: not supported)
+    marker_file: Optional[str] = None
+    
+    @abstractmethod
+    def load(self) -> Optional[Dict]:
+        """Load the last saved state, or None if nothing has been saved yet"""
+    
+    @abstractmethod
+    def save(self, playlist_data: Dict):
+        """Persist the current state"""
+    
+    def lookup_videos(self, previous_state: Dict, video_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Look up previous records for the given video ids, either from the loaded
+        state (as VideoRecords) or straight from storage (as stored dicts)"""
+        wanted = set(video_ids)
+        return {v.id: v for v in previous_state.get('videos', []) if v.id in wanted}
+    
+    def close(self):
+        """Release any resources held by the store"""
+
+class JsonStateStore(StateStore):
+    """Stores the last snapshot of a playlist in a JSON file"""
+    
+    def __init__(self, state_file: str):
+        self.state_file = state_file
+        self.description = state_file
+        self.marker_file = f"{state_file}.checked"
+    
+    def load(self) -> Optional[Dict]:
+        if not os.path.exists(self.state_file):
+            return None
+        
+        with open(self.state_file, 'r') as f:
+            return json.load(f)
+    
+    def save(self, playlist_data: Dict):
+        # Never leave a half-written state file behind
+        write_json_atomic(self.state_file, playlist_data, indent=2)
+
+class JournalStateStore(StateStore):
+    """Stores a JSON snapshot plus an append-only journal of per-cycle deltas.
+    
+    Each save appends one compact delta record (fsynced) holding only what
+    changed. Loading replays the journal on top of the snapshot, ignoring a
+    torn final record. Once the journal grows past `compact_bytes` it is
+    folded back into a fresh snapshot.
+    """
+    
+    def __init__(self, state_file: str, compact_bytes: int = 256 * 1024):
+        self.state_file = state_file
+        self.journal_file = f"{state_file}.journal"
+        self.compact_bytes = compact_bytes
+        self.description = f"{state_file} (+journal)"
+        self.marker_file = f"{state_file}.checked"
+        self._state = None
+        self._seq = 0
+        self._loaded = False
+    
+    @staticmethod
+    def _video_content(video: Optional[Dict]) -> Optional[Dict]:
+        if video is None:
+            return None
+        return {k: v for k, v in video.items() if k not in VOLATILE_VIDEO_FIELDS}
+    
+    def _diff(self, old: Dict, new: Dict) -> Dict:
+        """Build a delta record that turns `old` into `new`"""
+        record = {}
+        
+        meta = {k: v for k, v in new.items() if k != 'videos' and old.get(k) != v}
+        if meta:
+            record['meta'] = meta
+        dropped = [k for k in old if k != 'videos' and k not in new]
+        if dropped:
+            record['drop'] = dropped
+        
+        old_videos = {v['id']: v for v in old.get('videos', [])}
+        upsert = [
+            v for v in new.get('videos', [])
+            if self._video_content(old_videos.get(v['id'])) != self._video_content(v)
+        ]
+        if upsert:
+            record['upsert'] = upsert
+        
+        order = [v['id'] for v in new.get('videos', [])]
+        if order != [v['id'] for v in old.get('videos', [])]:
+            record['order'] = order
+        
+        return record
+    
+    @staticmethod
+    def _apply(state: Dict, record: Dict) -> Dict:
+        """Apply a delta record to a state, returning the new state"""
+        videos = {v['id']: v for v in state.get('videos', [])}
+        for video in record.get('upsert', []):
+            videos[video['id']] = video
+        order = record.get('order') or [v['id'] for v in state.get('videos', [])]
+        
+        new_state = {k: v for k, v in state.items() if k not in record.get('drop', [])}
+        new_state.update(record.get('meta', {}))
+        new_state['videos'] = [videos[video_id] for video_id in order]
+        return new_state
+    
+    def load(self) -> Optional[Dict]:
+        self._loaded = True
+        self._state = None
+        self._seq = 0
+        if not os.path.exists(self.state_file):
+            return None
+        
+        with open(self.state_file, 'r') as f:
+            state = json.load(f)
+        # Records up to this sequence number are already in the snapshot
+        self._seq = state.pop('_journal_seq', 0)
+        
+        if os.path.exists(self.journal_file):
+            good_offset = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash - everything before it is intact
+                        break
+                    if record['seq'] > self._seq:
+                        state = self._apply(state, record)
+                        self._seq = record['seq']
+                    good_offset += len(line)
+            
+            if good_offset < os.path.getsize(self.journal_file):
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good_offset)
+        
+        self._state = state
+        return state
+    
+    def save(self, playlist_data: Dict):
+        if not self._loaded:
+            self.load()
+        
+        if self._state is None:
+            self._write_snapshot(playlist_data)
+            return
+        
+        record = self._diff(self._state, playlist_data)
+        if record:
+            record['seq'] = self._seq + 1
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            with open(self.journal_file, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._state = self._apply(self._state, record)
+            self._seq = record['seq']
+        
+        if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) >= self.compact_bytes:
+            self.compact()
+    
+    def _write_snapshot(self, state: Dict):
+        write_json_atomic(self.state_file, dict(state, _journal_seq=self._seq))
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._state = state
+    
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        if not self._loaded:
+            self.load()
+        if self._state is not None:
+            self._write_snapshot(self._state)
+
+class SqliteStateStore(StateStore):
+    """Stores playlist state in SQLite, one row per (playlist, video).
+    
+    Many playlists can share one database file, each under its own
+    `playlist_key`. Videos that drop out of the monitored window keep their
+    row (with a NULL position), so the table doubles as a video history.
+    Only rows that actually changed are written on save.
+    """
+    
+    def __init__(self, db_path: str, playlist_key: str, legacy_json_file: Optional[str] = None):
+        self.db_path = db_path
+        self.playlist_key = playlist_key
+        self.legacy_json_file = legacy_json_file
+        self.description = f"{db_path} [{playlist_key}]"
+        self.marker_file = f"{db_path}.{playlist_key}.checked"
+        self._lock = threading.Lock()
+        
+        # Monitors run in a worker pool, so the connection may be used from
+        # different threads (never concurrently - guarded by the lock)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+    
+    def _video_from_row(self, row: tuple) -> Dict:
+        video_id, position, title, url, is_member_only, availability, error_message, checked_at, extra = row
+        video = {
+            'position': position,
+            'id': video_id,
+            'title': title,
+            'url': url,
+            'is_member_only': bool(is_member_only),
+            'availability': availability,
+            'error_message': error_message,
+            'checked_at': checked_at,
+        }
+        if extra:
+            video.update(json.loads(extra))
+        return video
+    
+    def _row_from_video(self, video: Dict) -> tuple:
+        extra = {k: v for k, v in video.items() if k != 'id' and k not in VIDEO_COLUMNS}
+        return (
+            video['id'],
+            video.get('position'),
+            video.get('title'),
+            video.get('url'),
+            int(bool(video.get('is_member_only'))),
+            video.get('availability'),
+            video.get('error_message'),
+            video.get('checked_at'),
+            json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else None,
+        )
+    
+    def _select_videos(self, where: str, params: List) -> List[tuple]:
+        return self._conn.execute(
+            "SELECT video_id, position, title, url, is_member_only, availability, "
+            f"error_message, checked_at, extra FROM videos WHERE playlist_key = ? AND {where}",
+            [self.playlist_key, *params]
+        ).fetchall()
+    
+    def _select_by_ids(self, video_ids: List[str]) -> List[tuple]:
+        rows = []
+        for i in range(0, len(video_ids), SQLITE_MAX_PARAMS):
+            chunk = video_ids[i:i + SQLITE_MAX_PARAMS]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(self._select_videos(f"video_id IN ({placeholders})", chunk))
+        return rows
+    
+    def _migrate_legacy_json(self) -> Optional[Dict]:
+        """Import the state from the JSON file used before switching to SQLite"""
+        if not self.legacy_json_file or not os.path.exists(self.legacy_json_file):
+            return None
+        
+        legacy_state = JsonStateStore(self.legacy_json_file).load()
+        if legacy_state:
+            self.save(legacy_state)
+        return legacy_state
+    
+    def load(self) -> Optional[Dict]:
+        with self._lock:
+            playlist_row = self._conn.execute(
+                "SELECT playlist_id, playlist_title, total_videos, monitored_at, metadata "
+                "FROM playlists WHERE playlist_key = ?",
+                (self.playlist_key,)
+            ).fetchone()
+            
+            if playlist_row is not None:
+                rows = self._select_videos("position IS NOT NULL ORDER BY position", [])
+        
+        if playlist_row is None:
+            return self._migrate_legacy_json()
+        
+        *columns, metadata = playlist_row
+        state = dict(zip(PLAYLIST_COLUMNS, columns))
+        if metadata:
+            state.update(json.loads(metadata))
+        state['videos'] = [self._video_from_row(row) for row in rows]
+        return state
+    
+    def save(self, playlist_data: Dict):
+        metadata = {
+            k: v for k, v in playlist_data.items()
+            if k != 'videos' and k not in PLAYLIST_COLUMNS
+        }
+        videos = playlist_data.get('videos', [])
+        
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO playlists (playlist_key, playlist_id, playlist_title, total_videos, "
+                "monitored_at, metadata) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (playlist_key) DO UPDATE SET playlist_id = excluded.playlist_id, "
+                "playlist_title = excluded.playlist_title, total_videos = excluded.total_videos, "
+                "monitored_at = excluded.monitored_at, metadata = excluded.metadata",
+                (self.playlist_key, *(playlist_data.get(k) for k in PLAYLIST_COLUMNS),
+                 json.dumps(metadata, ensure_ascii=False) if metadata else None)
+            )
+            
+            # Current rows for the previous snapshot plus any re-appearing videos
+            stored = {row[0]: row for row in self._select_videos("position IS NOT NULL", [])}
+            missing = [v['id'] for v in videos if v['id'] not in stored]
+            stored.update((row[0], row) for row in self._select_by_ids(missing))
+            
+            # checked_at alone doesn't make a row dirty; it records the last real change
+            changed = []
+            for video in videos:
+                row = self._row_from_video(video)
+                old = stored.get(video['id'])
+                if old is None or old[:7] + old[8:] != row[:7] + row[8:]:
+                    changed.append(row)
+            
+            self._conn.executemany(
+                "INSERT INTO videos (playlist_key, video_id, position, title, url, is_member_only, "
+                "availability, error_message, checked_at, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (playlist_key, video_id) DO UPDATE SET position = excluded.position, "
+                "title = excluded.title, url = excluded.url, is_member_only = excluded.is_member_only, "
+                "availability = excluded.availability, error_message = excluded.error_message, "
+                "checked_at = excluded.checked_at, extra = excluded.extra",
+                [(self.playlist_key, *row) for row in changed]
+            )
+            
+            # Videos that left the monitored window stay as history
+            current_ids = {v['id'] for v in videos}
+            dropped = [
+                (self.playlist_key, video_id) for video_id, row in stored.items()
+                if video_id not in current_ids and row[1] is not None
+            ]
+            self._conn.executemany(
+                "UPDATE videos SET position = NULL WHERE playlist_key = ? AND video_id = ?",
+                dropped
+            )
+    
+    def lookup_videos(self, previous_state: Dict, video_ids: Iterable[str]) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._select_by_ids(list(video_ids))
+        return {row[0]: self._video_from_row(row) for row in rows}
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Process-wide per-host rate limiting for yt-dlp requests
+"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from .metrics import MetricsRegistry, metrics
+
+# Responses that mean a host wants us to slow down
+THROTTLE_STATUSES = (429,)
+# Where YouTube sends clients it wants to show a consent form or a captcha
+CHALLENGE_HOSTS = ('consent.youtube.com', 'consent.google.com')
+CHALLENGE_PATH = '/sorry/'
+
+# After a throttle the rate drops to this fraction of the rate that was throttled...
+DECREASE_FACTOR = 0.5
+# ...then climbs back by this fraction of it per quiet recovery period, up to just under it
+INCREASE_STEP = 0.1
+CEILING_MARGIN = 0.9
+# A rate kept under its ceiling this many quiet periods in a row probes a little above it;
+# every probe that gets throttled doubles the wait before the next one, up to the max
+PROBE_PERIODS = 10
+MAX_PROBE_PERIODS = 80
+
+class HostThrottled(Exception):
+    """A host throttled us and won't be ready again within the allowed wait"""
+    
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"{host} is throttling requests, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+@dataclass
+class TokenBucket:
+    """Request budget of one host: `rate` per second on average, in bursts of up to `burst`"""
+    rate: float
+    burst: float
+    # Highest rate allowed; lowered to what was throttled, raised again by probing
+    ceiling: float
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0
+    # When the last throttle was noted, and how many came without a quiet period in between
+    throttled_at: float = 0.0
+    strikes: int = 0
+    # Start of the current quiet period, towards the next rate increase
+    recovered_at: float = 0.0
+    quiet_periods: int = 0
+    probe_periods: int = PROBE_PERIODS
+    # Rate that held for a whole probe interval before the current probe, if probing
+    safe_rate: float = 0.0
+    throttles: int = 0
+
+class RateLimiter:
+    """Token bucket per host, shared by every yt-dlp session in the process.
+    
+    A throttled response (HTTP 429, or a redirect to a consent or captcha
+    page) blocks the host for an exponentially growing, jittered backoff and
+    halves its rate. The rate then climbs back in small steps per quiet
+    `recovery_seconds`, but only to just under the rate that was throttled,
+    so sustained traffic settles below the host's threshold instead of
+    repeatedly overshooting it. Once settled, it occasionally probes a step
+    higher in case the threshold went up, and a throttled probe only steps
+    back. Requests that were already in flight when a throttle was noted
+    don't lower the rate again.
+    """
+    
+    def __init__(self, rate_per_second: float = 2.0, burst: float = 10,
+                 host_rates: Optional[Dict[str, float]] = None, backoff_seconds: float = 30,
+                 max_backoff_seconds: float = 900, max_wait_seconds: float = 60,
+                 recovery_seconds: float = 300, retries: int = 2):
+        self.logger = self._setup_logger()
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.configure(rate_per_second, burst, host_rates, backoff_seconds, max_backoff_seconds,
+                       max_wait_seconds, recovery_seconds, retries)
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the rate limiter"""
+        logger = logging.getLogger("rate_limiter")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def configure(self, rate_per_second: float = 2.0, burst: float = 10,
+                  host_rates: Optional[Dict[str, float]] = None, backoff_seconds: float = 30,
+                  max_backoff_seconds: float = 900, max_wait_seconds: float = 60,
+                  recovery_seconds: float = 300, retries: int = 2):
+        """Apply new limits; what was learnt about hosts so far is kept within them"""
+        with self._lock:
+            self.rate_per_second = rate_per_second
+            self.burst = burst
+            self.host_rates = dict(host_rates or {})
+            self.backoff_seconds = backoff_seconds
+            self.max_backoff_seconds = max_backoff_seconds
+            self.max_wait_seconds = max_wait_seconds
+            self.recovery_seconds = recovery_seconds
+            self.retries = retries
+            for host, bucket in self._buckets.items():
+                limit = self.host_rates.get(host, rate_per_second)
+                bucket.rate = min(bucket.rate, limit)
+                bucket.ceiling = min(bucket.ceiling, limit)
+                bucket.burst = max(burst, 1)
+    
+    def _bucket(self, host: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate = self.host_rates.get(host, self.rate_per_second)
+            bucket = self._buckets[host] = TokenBucket(rate, max(self.burst, 1), rate, self.burst, now,
+                                                       recovered_at=now)
+        return bucket
+    
+    def _recover(self, host: str, bucket: TokenBucket, now: float):
+        """Raise the rate of a host for every quiet recovery period since the last change"""
+        periods = int((now - bucket.recovered_at) // self.recovery_seconds)
+        if periods <= 0:
+            return
+        bucket.recovered_at += periods * self.recovery_seconds
+        bucket.strikes = 0
+        limit = self.host_rates.get(host, self.rate_per_second)
+        if bucket.rate >= limit:
+            return
+        
+        previous = bucket.rate
+        for _ in range(periods):
+            if bucket.rate >= limit:
+                break
+            cap = bucket.ceiling * CEILING_MARGIN if bucket.ceiling < limit else limit
+            if bucket.rate < cap:
+                bucket.rate = min(cap, bucket.rate + bucket.ceiling * INCREASE_STEP)
+                bucket.quiet_periods = 0
+            else:
+                # Settled just under the ceiling: find out now and then whether it has moved
+                bucket.quiet_periods += 1
+                if bucket.quiet_periods >= bucket.probe_periods:
+                    bucket.safe_rate = bucket.rate
+                    bucket.ceiling = min(limit, bucket.ceiling / CEILING_MARGIN)
+                    bucket.quiet_periods = 0
+        if bucket.rate != previous:
+            self.logger.info(f"🟢 {host} not throttled for {periods * self.recovery_seconds:g}s, "
+                             f"rate {previous:.2f} → {bucket.rate:.2f}/s")
+    
+    def acquire(self, host: str) -> float:
+        """Wait for a request slot to `host` and return when it was granted.
+        
+        Queueing behind the rate limit always waits; HostThrottled is raised
+        instead of waiting out a backoff longer than `max_wait_seconds`.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self._bucket(host, now)
+                self._recover(host, bucket, now)
+                
+                backoff = bucket.blocked_until - now
+                if backoff > self.max_wait_seconds:
+                    raise HostThrottled(host, backoff)
+                # Nothing accrues while a backoff runs
+                if now > bucket.updated:
+                    bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                    bucket.updated = now
+                # Take the token now and sleep off the debt, so waiting requests queue up in order
+                bucket.tokens -= 1
+                ready_at = max(bucket.blocked_until, bucket.updated + max(0.0, -bucket.tokens) / bucket.rate)
+                wait = ready_at - now
+                backing_off = ready_at == bucket.blocked_until
+            
+            if wait <= 0:
+                return now
+            if wait >= 1:
+                self.logger.info(f"⏳ Waiting {wait:.1f}s for {host} ({'backing off' if backing_off else 'rate limit'})")
+            time.sleep(wait)
+            
+            # A throttle noted in the meantime reset the queue: wait again behind its backoff
+            with self._lock:
+                if bucket.throttled_at <= now:
+                    return ready_at
+    
+    def throttled(self, host: str, issued_at: float, reason: str, retry_after: Optional[float] = None):
+        """Note a throttled response to a request granted at `issued_at`, and back off"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host, now)
+            bucket.throttles += 1
+            if issued_at < bucket.throttled_at:
+                # Already in flight when the last throttle was noted, which covered it
+                return
+            
+            bucket.strikes += 1
+            delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (bucket.strikes - 1))
+            # Equal jitter, so hosts (and processes) throttled together don't retry together
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            if retry_after:
+                delay = max(delay, min(retry_after, self.max_backoff_seconds))
+            
+            previous = bucket.rate
+            bucket.ceiling = bucket.rate
+            if bucket.safe_rate and bucket.rate > bucket.safe_rate:
+                # A probe above a rate that held: step back to it, and probe less often
+                bucket.rate = bucket.safe_rate
+                bucket.probe_periods = min(MAX_PROBE_PERIODS, bucket.probe_periods * 2)
+            else:
+                bucket.rate = max(bucket.rate * DECREASE_FACTOR, 1 / self.max_backoff_seconds)
+                bucket.probe_periods = PROBE_PERIODS
+            bucket.safe_rate = 0.0
+            bucket.throttled_at = now
+            bucket.blocked_until = now + delay
+            # One request goes as soon as the backoff ends, then the reduced rate applies
+            bucket.tokens = 1
+            bucket.updated = bucket.blocked_until
+            bucket.recovered_at = bucket.blocked_until
+            bucket.quiet_periods = 0
+        
+        self.logger.warning(f"🚦 {host} throttled us ({reason}): backing off {delay:.0f}s, "
+                            f"rate {previous:.2f} → {bucket.rate:.2f}/s")
+    
+    def _collect(self, value) -> Dict[str, float]:
+        with self._lock:
+            now = time.monotonic()
+            for host, bucket in self._buckets.items():
+                self._recover(host, bucket, now)
+            return {host: value(bucket, now) for host, bucket in self._buckets.items()}
+    
+    def export_metrics(self, registry: MetricsRegistry):
+        """Expose the rate, backoff and throttle count of every host in `registry`"""
+        registry.register('fetch_rate_per_second', 'Current request rate allowed per host.', 'gauge',
+                          'host', lambda: self._collect(lambda bucket, now: bucket.rate))
+        registry.register('fetch_backoff_seconds', 'Seconds until a throttled host is tried again.', 'gauge',
+                          'host', lambda: self._collect(lambda bucket, now: max(0.0, bucket.blocked_until - now)))
+        registry.register('fetch_throttled_total', 'Throttled responses (429 or consent page) per host.', 'counter',
+                          'host', lambda: self._collect(lambda bucket, now: bucket.throttles))
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current state of every host that was requested"""
+        with self._lock:
+            now = time.monotonic()
+            for host, bucket in self._buckets.items():
+                self._recover(host, bucket, now)
+            return {
+                host: {
+                    'rate_per_second': round(bucket.rate, 3),
+                    'ceiling_per_second': round(bucket.ceiling, 3),
+                    'backoff_seconds': round(max(0.0, bucket.blocked_until - now), 1),
+                    'throttled': bucket.throttles,
+                }
+                for host, bucket in self._buckets.items()
+            }
+    
+    def install(self, ydl):
+        """Route every HTTP request of a yt-dlp session through the limiter"""
+        urlopen = ydl.urlopen
+        
+        def limited_urlopen(req):
+            url = req if isinstance(req, str) else getattr(req, 'url', None) or req.get_full_url()
+            host = urlsplit(url).hostname or ''
+            for attempt in range(self.retries + 1):
+                issued_at = self.acquire(host)
+                try:
+                    response = urlopen(req)
+                except Exception as e:
+                    if getattr(e, 'status', None) not in THROTTLE_STATUSES:
+                        raise
+                    self.throttled(host, issued_at, f"HTTP {e.status}", _retry_after(e))
+                    continue
+                
+                challenge = _challenge(getattr(response, 'url', None) or url)
+                if challenge:
+                    response.close()
+                    self.throttled(host, issued_at, challenge)
+                    continue
+                return response
+            
+            with self._lock:
+                retry_in = max(0.0, self._buckets[host].blocked_until - time.monotonic())
+            raise HostThrottled(host, retry_in)
+        
+        ydl.urlopen = limited_urlopen
+        return ydl
+
+def _challenge(url: str) -> Optional[str]:
+    """What kind of challenge page a response landed on, if any"""
+    parts = urlsplit(url)
+    if parts.hostname in CHALLENGE_HOSTS:
+        return "consent page"
+    if parts.path.startswith(CHALLENGE_PATH):
+        return "captcha page"
+    return None
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds asked for by the Retry-After header of an error response"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+# Shared by every yt-dlp session in the process
+rate_limiter = RateLimiter()
+rate_limiter.export_metrics(metrics)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP transport for the Resend email API
+"""
+
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_URL = "https://api.resend.com"
+
+class ResendTransport:
+    """Sends emails through one keep-alive connection pool shared by every send.
+    
+    Talks to the Resend REST API directly instead of going through the SDK's
+    module-global client, so connections (and their TLS handshakes) are
+    reused across sends and the endpoint can point at a local stand-in server.
+    """
+    
+    def __init__(self, api_key: str, api_url: str = DEFAULT_API_URL, pool_size: int = 10,
+                 connect_timeout: float = 5, read_timeout: float = 30):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f"Bearer {api_key}",
+            'Accept': 'application/json',
+            'User-Agent': 'youtube-monitor',
+        })
+    
+    def _post(self, path: str, payload) -> Dict:
+        response = self.session.post(f"{self.api_url}{path}", json=payload, timeout=self.timeout)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise RuntimeError(f"Resend API returned {response.status_code}: {message}")
+        return response.json() if response.content else {}
+    
+    def send(self, params: Dict) -> Dict:
+        """Send one email"""
+        return self._post('/emails', params)
+    
+    def send_batch(self, params: List[Dict]) -> Dict:
+        """Send up to 100 emails in one request"""
+        return self._post('/emails/batch', params)
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Per-video availability verification for candidate transitions
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import yt_dlp
+
+from .metrics import metrics
+from .rules import GATED_AVAILABILITY
+from .state_store import write_json_atomic
+from .throttle import rate_limiter
+
+# Extraction errors that mean the video is gated rather than broken
+MEMBER_ERROR_KEYWORDS = ('member', 'join this channel', 'premium', 'subscriber')
+
+class AvailabilityVerifier:
+    """Confirms title-based transitions by fully extracting the videos involved.
+    
+    Only candidate videos are probed, in a bounded thread pool, and 'free'
+    verdicts are cached per video id for a TTL, so the cost follows the
+    number of changes rather than the playlist size. 'member_only' verdicts
+    aren't cached: a held-back video is probed again on the next check, so
+    it is announced as soon as it really opens up.
+    """
+    
+    def __init__(self, max_workers: int = 4, ttl_seconds: float = 6 * 3600,
+                 cache_file: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.cache_file = cache_file
+        self.logger = self._setup_logger()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="verify")
+        self._lock = threading.Lock()
+        # Monitors of different playlists save the cache concurrently, through one temp file
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._sessions: List[yt_dlp.YoutubeDL] = []
+        self._cache: Dict[str, Dict] = self._load_cache()
+    
+    def _setup_logger(self) -> logging.Logger:
+        """Set up logging for the verifier"""
+        logger = logging.getLogger("availability_verifier")
+        logger.setLevel(logging.INFO)
+        
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            )
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        
+        return logger
+    
+    def _load_cache(self) -> Dict[str, Dict]:
+        """Load cached verdicts that haven't expired yet"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        
+        try:
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error loading verification cache: {e}")
+            return {}
+        
+        now = time.time()
+        return {video_id: entry for video_id, entry in cache.items()
+                if entry['verdict'] == 'free' and now - entry['checked_at'] < self.ttl_seconds}
+    
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        with self._write_lock:
+            now = time.time()
+            with self._lock:
+                cache = {video_id: entry for video_id, entry in self._cache.items()
+                         if now - entry['checked_at'] < self.ttl_seconds}
+                # Written from its own copy, as other threads keep adding verdicts
+                self._cache = dict(cache)
+            try:
+                write_json_atomic(self.cache_file, cache)
+            except OSError as e:
+                self.logger.error(f"Error saving verification cache: {e}")
+    
+    def _cached(self, video_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(video_id)
+            if entry and time.time() - entry['checked_at'] < self.ttl_seconds:
+                return entry['verdict']
+        return None
+    
+    def _session(self) -> yt_dlp.YoutubeDL:
+        """yt-dlp session of the current worker thread (sessions aren't thread-safe)"""
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = rate_limiter.install(yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'skip_download': True}))
+            self._local.ydl = ydl
+            with self._lock:
+                self._sessions.append(ydl)
+        return ydl
+    
+    def _probe(self, video_id: str) -> Optional[str]:
+        """Fully extract one video; None when the result is inconclusive"""
+        try:
+            info = self._session().extract_info(
+                f"https://www.youtube.com/watch?v={video_id}", download=False
+            )
+        except yt_dlp.utils.DownloadError as e:
+            message = str(e).lower()
+            if any(keyword in message for keyword in MEMBER_ERROR_KEYWORDS):
+                return 'member_only'
+            self.logger.warning(f"Could not verify video {video_id}: {e}")
+            return None
+        except Exception as e:
+            self.logger.warning(f"Could not verify video {video_id}: {e}")
+            return None
+        
+        if not info:
+            return None
+        return 'member_only' if info.get('availability') in GATED_AVAILABILITY else 'free'
+    
+    def verify(self, video_ids: List[str]) -> Dict[str, str]:
+        """Verdict for each video that could be verified, probing only uncached ones"""
+        video_ids = list(dict.fromkeys(video_ids))
+        verdicts = {}
+        to_probe = []
+        for video_id in video_ids:
+            verdict = self._cached(video_id)
+            if verdict:
+                verdicts[video_id] = verdict
+            else:
+                to_probe.append(video_id)
+        
+        if not to_probe:
+            return verdicts
+        
+        with metrics.stage('verify'):
+            start = time.monotonic()
+            results = list(self._executor.map(self._probe, to_probe))
+            
+            now = time.time()
+            with self._lock:
+                for video_id, verdict in zip(to_probe, results):
+                    if verdict:
+                        verdicts[video_id] = verdict
+                    if verdict == 'free':
+                        self._cache[video_id] = {'verdict': verdict, 'checked_at': now}
+            self._save_cache()
+        
+        self.logger.info(
+            f"Verified {len(to_probe)} video(s) in {time.monotonic() - start:.2f}s "
+            f"({len(video_ids) - len(to_probe)} cached)"
+        )
+        return verdicts
+    
+    def close(self):
+        """Stop the worker threads and close their yt-dlp sessions"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for ydl in sessions:
+            try:
+                ydl.close()
+            except Exception as e:
+                self.logger.warning(f"Error closing yt-dlp session: {e}")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the monitoring cycle
+
+Replays a recorded playlist (see replay.py) through PlaylistMonitor.monitor_once
+at several synthetic playlist sizes and playlist counts, timing each stage
+separately, and writes the results to a JSON file.
+
+    uv run tests/benchmark_cycle.py --output benchmark_results.json
+    uv run tests/benchmark_cycle.py --baseline benchmark_results.json   # fail on regressions
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from replay import DEFAULT_FIXTURE, ReplayPlaylistMonitor, load_fixture, synthetic_playlist
+from src.email_notifier import EmailNotifier
+from src.metrics import metrics
+from src.multi_monitor import MultiPlaylistMonitor
+from src.state_store import JournalStateStore, JsonStateStore, SqliteStateStore
+
+STAGES = ('fetch', 'classify', 'load', 'detect', 'save', 'render', 'cycle')
+
+def _create_store(backend: str, workdir: Path, key: str):
+    state_file = str(workdir / f"state_{key}.json")
+    if backend == 'sqlite':
+        return SqliteStateStore(str(workdir / "state.db"), key)
+    if backend == 'journal':
+        return JournalStateStore(state_file)
+    return JsonStateStore(state_file)
+
+def _instrument(monitor: ReplayPlaylistMonitor, timings: Dict[str, float]):
+    """Wrap the monitor's stage methods so monitor_once reports per-stage time"""
+    def timed(stage, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[stage] += time.perf_counter() - start
+        return wrapper
+    
+    monitor._build_video = timed('classify', monitor._build_video)
+    monitor.load_previous_state = timed('load', monitor.load_previous_state)
+    monitor.save_current_state = timed('save', monitor.save_current_state)
+
+def _mutate(info: Dict, cycle: int) -> Dict:
+    """Simulate a release: a new free upload at the top and one older video going 限免"""
+    entries = [dict(entry) for entry in info['entries']]
+    new_id = f"NEW{cycle:04d}{info['id'][-4:]}"
+    entries.insert(0, {
+        '_type': 'url', 'ie_key': 'Youtube', 'id': new_id,
+        'url': f"https://www.youtube.com/watch?v={new_id}",
+        'title': f"【会员限免】New upload {cycle}",
+    })
+    for entry in entries[1:]:
+        if '限免' not in entry['title']:
+            entry['title'] = f"【会员限免】{entry['title']}"
+            break
+    return dict(info, playlist_count=len(entries), entries=entries)
+
+def run_scenario(fixture: Dict, size: int, playlists: int, scan_mode: str,
+                 backend: str, notifier: EmailNotifier) -> Dict[str, float]:
+    """Run one warm-up cycle and one measured cycle, returning stage timings"""
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        monitors = []
+        for p in range(playlists):
+            key = f"PLBENCH{p:04d}"
+            info = synthetic_playlist(fixture, size, playlist_id=key)
+            monitors.append(ReplayPlaylistMonitor(
+                f"https://www.youtube.com/playlist?list={key}",
+                info,
+                scan_mode=scan_mode,
+                state_store=_create_store(backend, workdir, key)
+            ))
+        
+        engine = MultiPlaylistMonitor(monitors, max_workers=min(playlists, 8))
+        try:
+            # Warm-up cycle establishes the previous state (and watermark)
+            engine.monitor_all()
+            
+            per_monitor = []
+            for monitor in monitors:
+                monitor.session.info = _mutate(monitor.session.info, 1)
+                monitor.session.fetch_seconds = 0.0
+                timings = defaultdict(float)
+                _instrument(monitor, timings)
+                per_monitor.append(timings)
+            
+            # Change detection runs interleaved with paging, so it times itself
+            metrics.reset()
+            start = time.perf_counter()
+            results = engine.monitor_all()
+            cycle_seconds = time.perf_counter() - start
+            detect_seconds = metrics.to_dict()['stages'].get('detect', {}).get('total_seconds', 0.0)
+            
+            start = time.perf_counter()
+            for changes in results.values():
+                if changes:
+                    notifier._generate_subject(changes)
+                    notifier._generate_html_content(changes)
+                    notifier._generate_text_content(changes)
+            render_seconds = time.perf_counter() - start
+        finally:
+            engine.close()
+        
+        totals = defaultdict(float)
+        for monitor, timings in zip(monitors, per_monitor):
+            for stage, seconds in timings.items():
+                totals[stage] += seconds
+            totals['fetch'] += monitor.session.fetch_seconds
+        
+        return {
+            'fetch': totals['fetch'],
+            'classify': totals['classify'],
+            'load': totals['load'],
+            'detect': detect_seconds,
+            'save': totals['save'],
+            'render': render_seconds,
+            'cycle': cycle_seconds,
+            'changes': sum(len(changes) for changes in results.values()),
+        }
+
+def run_benchmarks(args) -> Dict:
+    fixture = load_fixture(Path(args.fixture))
+    notifier = EmailNotifier("benchmark-key", "bench@example.com", "bench@example.com")
+    
+    results = []
+    for scan_mode in args.scan_modes:
+        for size in args.sizes:
+            for playlists in args.playlists:
+                runs = [
+                    run_scenario(fixture, size, playlists, scan_mode, args.backend, notifier)
+                    for _ in range(args.repeat)
+                ]
+                stages = {
+                    stage: {
+                        'median': statistics.median(run[stage] for run in runs),
+                        'min': min(run[stage] for run in runs),
+                        'max': max(run[stage] for run in runs),
+                    }
+                    for stage in STAGES
+                }
+                result = {
+                    'name': f"{scan_mode}/{args.backend}/size={size}/playlists={playlists}",
+                    'scan_mode': scan_mode,
+                    'backend': args.backend,
+                    'size': size,
+                    'playlists': playlists,
+                    'changes': runs[0]['changes'],
+                    'stages': stages,
+                }
+                results.append(result)
+                print(f"⏱️  {result['name']}: cycle {stages['cycle']['median'] * 1000:.1f} ms "
+                      f"({result['changes']} changes)")
+    
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+def compare_to_baseline(report: Dict, baseline_file: str, tolerance: float,
+                        min_seconds: float) -> List[str]:
+    """Return a description of every stage that got slower than the baseline allows"""
+    with open(baseline_file, 'r') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    
+    regressions = []
+    for result in report['results']:
+        base = baseline.get(result['name'])
+        if not base:
+            continue
+        for stage, stats in result['stages'].items():
+            old = base['stages'].get(stage, {}).get('median')
+            new = stats['median']
+            # Ignore noise on stages that take next to no time
+            if old is not None and new > min_seconds and new > old * (1 + tolerance):
+                regressions.append(
+                    f"{result['name']} {stage}: {old * 1000:.2f} ms → {new * 1000:.2f} ms"
+                )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline monitoring cycle benchmark")
+    parser.add_argument('--fixture', default=str(DEFAULT_FIXTURE), help='Recorded playlist response')
+    parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')],
+                        default=[3, 100, 1000, 10000], help='Synthetic playlist sizes')
+    parser.add_argument('--playlists', type=lambda s: [int(x) for x in s.split(',')],
+                        default=[1, 10], help='Numbers of playlists monitored together')
+    parser.add_argument('--scan-modes', type=lambda s: s.split(','),
+                        default=['head', 'incremental', 'full'], help='Scan modes to benchmark')
+    parser.add_argument('--backend', choices=['json', 'journal', 'sqlite'], default='json')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='Previous results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown relative to the baseline (0.25 = 25%%)')
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help='Stages faster than this are never reported as regressions')
+    args = parser.parse_args()
+    
+    # Per-video log lines would dominate the measurements
+    logging.disable(logging.INFO)
+    
+    print("🧪 Benchmarking monitoring cycle (offline replay)")
+    print("=" * 50)
+    report = run_benchmarks(args)
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+    
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, args.tolerance, args.min_ms / 1000)
+        if regressions:
+            print("\n❌ Performance regressions:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
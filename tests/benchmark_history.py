@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the history store
+
+Records months of synthetic checks (playlists of member-only videos, a few
+of which go free for a while every day) into a fresh history database,
+compresses everything older than the cutoff, then times the queries behind
+`main.py --mode history`: statistics over the whole range and over the last
+month, and the timeline of one video. Fails if any query takes longer than
+`--max-query-ms`.
+    
+    uv run tests/benchmark_history.py
+    uv run tests/benchmark_history.py --months 12 --playlists 20 --videos 1000
+"""
+
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.history import HistoryStore
+from src.records import Availability, ChangeEvent, ChangeType, VideoRecord
+
+def _timestamp(at: float) -> str:
+    return datetime.fromtimestamp(at).isoformat()
+
+def record_history(history: HistoryStore, days: int, playlists: int, videos: int, checks_per_day: int) -> int:
+    """Record `days` of checks ending now, returning how many were recorded"""
+    rng = random.Random(42)
+    start = time.time() - days * 86400
+    interval = 86400 / checks_per_day
+    states = {}
+    for p in range(playlists):
+        states[f"PL{p}"] = [VideoRecord(i, f"p{p}v{i}", f"Video {i}", True, None) for i in range(videos)]
+    free_until = {playlist: {} for playlist in states}
+    
+    checks = 0
+    for n in range(days * checks_per_day):
+        at = start + n * interval
+        checked_at = _timestamp(at)
+        for playlist, records in states.items():
+            changes = []
+            # Free spells end after one to three days
+            for index, until in list(free_until[playlist].items()):
+                if at >= until:
+                    records[index].is_member_only = True
+                    del free_until[playlist][index]
+                    changes.append((records[index], ChangeType.FREE_TO_MEMBER))
+            # About one video a day goes free
+            if rng.random() < 1 / checks_per_day:
+                index = rng.randrange(videos)
+                if index not in free_until[playlist]:
+                    records[index].is_member_only = False
+                    free_until[playlist][index] = at + rng.uniform(1, 3) * 86400
+                    changes.append((records[index], ChangeType.MEMBER_TO_FREE))
+            
+            events = [ChangeEvent(kind, video.id, video.title,
+                                  Availability.LIMITED_FREE if video.is_member_only else Availability.MEMBER_ONLY,
+                                  video.availability, playlist, checked_at).to_dict()
+                      for video, kind in changes]
+            # Unchanged playlists are recorded without their videos, as monitor_once does
+            history.record_check(playlist, checked_at, records if changes else None, events)
+            freed = [event for event in events if event['type'] == ChangeType.MEMBER_TO_FREE]
+            if freed:
+                history.record_alerts({'reader@example.com': freed, 'other@example.com': freed})
+            checks += 1
+    return checks
+
+def timed(query: Callable) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = query()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="History store benchmark")
+    parser.add_argument('--months', type=int, default=6, help='Months of history to record')
+    parser.add_argument('--playlists', type=int, default=10, help='Number of playlists')
+    parser.add_argument('--videos', type=int, default=500, help='Videos per playlist')
+    parser.add_argument('--checks-per-day', type=int, default=4, help='Checks of each playlist per day')
+    parser.add_argument('--compress-days', type=float, default=30, help='Age at which history is compressed')
+    parser.add_argument('--max-query-ms', type=float, default=500, help='Fail if a query takes longer than this')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    days = args.months * 30
+    
+    print("🧪 Benchmarking the history store (synthetic checks)")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "history.db"
+        history = HistoryStore(str(db_path), compress_after_days=args.compress_days)
+        # Compress once at the end rather than as the recording goes
+        history._compacted_at = float('inf')
+        
+        record_seconds, checks = timed(lambda: record_history(
+            history, days, args.playlists, args.videos, args.checks_per_day))
+        print(f"⏱️  Recorded {checks} checks of {args.playlists} x {args.videos} videos over {days} days "
+              f"in {record_seconds:.1f} s ({record_seconds / checks * 1000:.2f} ms per check)")
+        
+        compact_seconds, _ = timed(history.compact)
+        print(f"🗜️  Compressed history older than {args.compress_days:g} days in {compact_seconds * 1000:.0f} ms, "
+              f"database is {db_path.stat().st_size / 1024:.0f} KiB")
+        
+        now = time.time()
+        # A video that went free early on, so its timeline spans archived months
+        video_id = next(history._rows('transitions', until=now - days * 86400 + 30 * 86400))[1]
+        queries = {
+            f"stats over {days} days": lambda: history.stats(now - days * 86400),
+            "stats over 30 days": lambda: history.stats(now - 30 * 86400),
+            f"timeline of {video_id}": lambda: history.timeline(video_id),
+        }
+        
+        failures = []
+        for name, query in queries.items():
+            seconds, result = timed(query)
+            summary = (f"{sum(result['transitions'].values())} transitions" if isinstance(result, dict)
+                       else f"{len(result)} events")
+            print(f"⏱️  {name}: {seconds * 1000:.0f} ms ({summary})")
+            if seconds * 1000 > args.max_query_ms:
+                failures.append(f"{name} took {seconds * 1000:.0f} ms")
+        history.close()
+    
+    if failures:
+        print("\n❌ History queries are too slow:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print(f"\n✅ Every query answers within {args.max_query_ms:g} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of notification sending
+
+Starts a local stand-in for the Resend API and measures EmailNotifier
+throughput over the pooled transport, compared with the resend SDK making
+a fresh request per send (the SDK comparison needs the `benchmark` extra).
+The stand-in counts TCP connections, so reuse of the keep-alive pool is
+visible.
+
+    uv run --extra benchmark tests/benchmark_notify.py
+    uv run tests/benchmark_notify.py --sends 500 --latency-ms 20
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmark_render import make_changes
+from src.email_notifier import EmailNotifier
+from src.transport import ResendTransport
+
+class StandInResendServer(ThreadingHTTPServer):
+    """Local HTTP server answering /emails and /emails/batch like the Resend API"""
+    
+    daemon_threads = True
+    
+    def __init__(self, latency: float = 0.0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.emails = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, name="stand-in-resend", daemon=True).start()
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+    
+    def count(self, connections: int = 0, requests: int = 0, emails: int = 0):
+        with self._lock:
+            self.connections += connections
+            self.requests += requests
+            self.emails += emails
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+    
+    def setup(self):
+        super().setup()
+        self.server.count(connections=1)
+    
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        
+        if self.path == '/emails/batch':
+            self.server.count(requests=1, emails=len(payload))
+            result = {'data': [{'id': f"batch-{i}"} for i in range(len(payload))]}
+        elif self.path == '/emails':
+            self.server.count(requests=1, emails=1)
+            result = {'id': 'single'}
+        else:
+            self.send_error(404)
+            return
+        
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def run(label: str, server: StandInResendServer, sends: int, send) -> None:
+    before = (server.connections, server.requests, server.emails)
+    start = time.perf_counter()
+    for _ in range(sends):
+        if not send():
+            print(f"❌ {label}: send failed")
+            sys.exit(1)
+    seconds = time.perf_counter() - start
+    connections, requests_, emails = (now - then for now, then in
+                                      zip((server.connections, server.requests, server.emails), before))
+    print(f"⏱️  {label}: {sends / seconds:8.1f} sends/s, {emails} email(s) in "
+          f"{requests_} request(s) over {connections} connection(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline notification throughput benchmark")
+    parser.add_argument('--sends', type=int, default=200, help='Notifications sent per scenario')
+    parser.add_argument('--changes', type=int, default=5, help='Changes per notification')
+    parser.add_argument('--recipients', type=int, default=250,
+                        help='Recipients of the batched scenario')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Simulated API latency per request')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    server = StandInResendServer(latency=args.latency_ms / 1000)
+    changes = make_changes(args.changes)
+    
+    print(f"🧪 Benchmarking notification sending against {server.url}")
+    print("=" * 50)
+    
+    transport = ResendTransport("benchmark-key", api_url=server.url)
+    pooled = EmailNotifier("benchmark-key", "bench@example.com", "bench@example.com", transport=transport)
+    run("pooled transport", server, args.sends, lambda: pooled.send_notification(changes))
+    
+    try:
+        import resend
+    except ImportError:
+        resend = None
+    if resend is not None:
+        # What the notifier used to do: the SDK's module-global client
+        resend.api_key = "benchmark-key"
+        resend.api_url = server.url
+        content = pooled.render(changes)
+        def sdk_send():
+            resend.Emails.send(pooled.build_email(content, "bench@example.com"))
+            return True
+        run("resend SDK", server, args.sends, sdk_send)
+    
+    recipients = [f"user{i}@example.com" for i in range(args.recipients)]
+    run(f"batched to {len(recipients)} recipients", server, 1,
+        lambda: pooled.send_notification(changes, recipients))
+    
+    pooled.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
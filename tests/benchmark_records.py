@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark of video and change records
+
+Holds a 100k-video playlist state in memory as VideoRecords and as the
+per-video dicts the monitor used before, both freshly built and loaded back
+from the state file format, and times the conversion to and from that
+format. Fails if records stop being clearly smaller than the dicts.
+
+    uv run tests/benchmark_records.py
+    uv run tests/benchmark_records.py --count 500000
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.records import (Availability, ChangeEvent, ChangeType, Signal, VideoRecord,
+                         state_from_dict, state_to_dict)
+
+RULE = '限免'
+
+def make_entries(count: int) -> List[Dict]:
+    """Flat playlist entries, every tenth one free and every seventh badged"""
+    return [
+        {
+            'id': f"BENCH{i:06d}",
+            'title': f"【{'会员限免' if i % 10 == 0 else '会员'}】Episode {i} of the benchmark series",
+            'availability': 'subscriber_only' if i % 7 == 0 else None,
+            'duration': 1800.0,
+        }
+        for i in range(count)
+    ]
+
+def build_dicts(entries: List[Dict], checked_at: str) -> List[Dict]:
+    """Video records the way the monitor built them before VideoRecord"""
+    videos = []
+    for position, entry in enumerate(entries, 1):
+        is_member_only = RULE not in entry['title']
+        availability = entry['availability'].strip().lower() if entry['availability'] else None
+        videos.append({
+            'position': position,
+            'id': entry['id'],
+            'title': entry['title'],
+            'url': f"https://www.youtube.com/watch?v={entry['id']}",
+            'is_member_only': is_member_only,
+            'availability': 'member_only' if is_member_only else 'limited_free',
+            'matched_rule': None if is_member_only else RULE,
+            'metadata_availability': availability,
+            'duration': int(entry['duration']),
+            'live_status': None,
+            'signal': 'title',
+            'error_message': None,
+            'checked_at': checked_at,
+        })
+    return videos
+
+def build_records(entries: List[Dict], checked_at: str) -> List[VideoRecord]:
+    return [
+        VideoRecord(position, entry['id'], entry['title'], RULE not in entry['title'], checked_at,
+                    None if RULE not in entry['title'] else RULE,
+                    'subscriber_only' if entry['availability'] else None,
+                    int(entry['duration']), None, Signal.TITLE)
+        for position, entry in enumerate(entries, 1)
+    ]
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    """Memory still held by what `build` returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def timed(func: Callable[[], object]):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Video/change record memory benchmark")
+    parser.add_argument('--count', type=int, default=100_000, help='Videos in the playlist state')
+    parser.add_argument('--max-ratio', type=float, default=0.6,
+                        help='Fail if records take more than this fraction of the dicts\' memory')
+    args = parser.parse_args()
+
+    entries = make_entries(args.count)
+    checked_at = datetime.now().isoformat()
+    # Titles and ids come from yt-dlp either way; only the records themselves are counted
+    baseline = retained_bytes(lambda: None)
+
+    print(f"🧪 Benchmarking {args.count} video records")
+    print("=" * 50)
+
+    results = {}
+    results['dicts, built'] = retained_bytes(lambda: build_dicts(entries, checked_at))
+    results['records, built'] = retained_bytes(lambda: build_records(entries, checked_at))
+
+    # What a resident monitor holds after loading the previous state from disk
+    records = build_records(entries, checked_at)
+    state = {'playlist_id': 'PLBENCH', 'monitored_at': checked_at, 'videos': records}
+    stored, dump_seconds = timed(lambda: json.dumps(state_to_dict(state), ensure_ascii=False))
+    del records, state
+    results['dicts, loaded'] = retained_bytes(lambda: json.loads(stored))
+    results['records, loaded'] = retained_bytes(lambda: state_from_dict(json.loads(stored)))
+    _, load_seconds = timed(lambda: state_from_dict(json.loads(stored)))
+
+    for label, size in results.items():
+        print(f"💾 {label:<16} {(size - baseline) / 2**20:8.1f} MiB "
+              f"({(size - baseline) / args.count:6.0f} bytes/video)")
+    print(f"⏱️  serialise {dump_seconds * 1000:.0f} ms, deserialise {load_seconds * 1000:.0f} ms "
+          f"({len(stored) / 2**20:.1f} MiB of JSON)")
+
+    detected_at = datetime.now().isoformat()
+    change_dicts = retained_bytes(lambda: [
+        {'type': 'member_to_free', 'video_id': entry['id'], 'title': entry['title'],
+         'url': f"https://www.youtube.com/watch?v={entry['id']}", 'previous_status': 'member_only',
+         'current_status': 'limited_free', 'playlist_title': 'Benchmark', 'detected_at': detected_at}
+        for entry in entries
+    ])
+    change_events = retained_bytes(lambda: [
+        ChangeEvent(ChangeType.MEMBER_TO_FREE, entry['id'], entry['title'], Availability.MEMBER_ONLY,
+                    Availability.LIMITED_FREE, 'Benchmark', detected_at)
+        for entry in entries
+    ])
+    print(f"💾 changes: {change_dicts / args.count:.0f} bytes/change as dicts, "
+          f"{change_events / args.count:.0f} as ChangeEvents")
+
+    ratios = [
+        (results['records, built'] - baseline) / (results['dicts, built'] - baseline),
+        (results['records, loaded'] - baseline) / (results['dicts, loaded'] - baseline),
+    ]
+    worst = max(ratios)
+    if worst > args.max_ratio:
+        print(f"\n❌ Records take {worst:.0%} of the dicts' memory (limit {args.max_ratio:.0%})")
+        sys.exit(1)
+    print(f"\n✅ Records take at most {worst:.0%} of the dicts' memory")
+
+if __name__ == "__main__":
+    main()
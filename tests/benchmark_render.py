@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark of notification email rendering
+
+Renders digests of increasing size and checks that the time per change
+stays flat (linear scaling), then shows the cost of sending one digest to
+many recipients, which reuses a single render.
+
+    uv run tests/benchmark_render.py
+    uv run tests/benchmark_render.py --sizes 100,1000,10000 --recipients 50
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.email_notifier import EmailNotifier
+
+def make_changes(count: int) -> List[Dict]:
+    """Build a digest's worth of changes, with titles that need escaping"""
+    detected_at = datetime.now().isoformat()
+    return [
+        {
+            'type': 'member_to_free',
+            'video_id': f"BENCH{i:07d}",
+            'title': f"【会员限免】Episode <{i}> & \"friends\"",
+            'url': f"https://www.youtube.com/watch?v=BENCH{i:07d}&list=PLBENCH",
+            'previous_status': 'member_only',
+            'current_status': 'limited_free',
+            'playlist_title': 'Benchmark',
+            'detected_at': detected_at,
+        }
+        for i in range(count)
+    ]
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification rendering benchmark")
+    parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')],
+                        default=[10, 100, 1000, 10000], help='Changes per digest')
+    parser.add_argument('--recipients', type=int, default=100,
+                        help='Recipients sharing one 1k-change digest')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='Fail if the time per change grows more than this factor from the smallest size')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    notifier = EmailNotifier("benchmark-key", "bench@example.com", "bench@example.com")
+    
+    print("🧪 Benchmarking email rendering")
+    print("=" * 50)
+    
+    per_change = {}
+    for size in args.sizes:
+        changes = make_changes(size)
+        seconds = best_of(args.repeat, lambda: notifier.render(changes))
+        per_change[size] = seconds / size
+        print(f"⏱️  {size:>6} changes: {seconds * 1000:8.2f} ms ({per_change[size] * 1e6:.2f} µs/change)")
+    
+    # Every recipient of the same digest gets the same rendered content
+    recipients = [f"user{i}@example.com" for i in range(args.recipients)]
+    changes = make_changes(1000)
+    def build_shared():
+        content = notifier.render(changes)
+        return [notifier.build_email(content, recipient) for recipient in recipients]
+    shared = best_of(args.repeat, build_shared)
+    separate = best_of(1, lambda: [notifier.render(changes) for _ in recipients])
+    print(f"⏱️  1000 changes to {len(recipients)} recipients: {shared * 1000:.2f} ms shared render, "
+          f"{separate * 1000:.2f} ms rendering per recipient")
+    
+    smallest = min(args.sizes)
+    worst = max(per_change.values()) / per_change[smallest]
+    if worst > args.max_growth:
+        print(f"\n❌ Rendering is not linear: time per change grew {worst:.1f}x")
+        sys.exit(1)
+    print(f"\n✅ Rendering scales linearly (time per change within {worst:.1f}x)")
+
+if __name__ == "__main__":
+    main()
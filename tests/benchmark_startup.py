@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark of the CLI modes
+
+Starts a fresh interpreter per mode with `-X importtime`, sets the mode up
+the way `main.py` does (without fetching or sending anything) and adds up
+the import time it paid. Fails when a mode goes over its budget in
+`startup_budget.json` or imports a module it shouldn't need.
+
+    uv run tests/benchmark_startup.py
+    uv run tests/benchmark_startup.py --modes test-email --repeat 10
+    uv run tests/benchmark_startup.py --update-budget   # after an intended change
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).resolve().parent / 'startup_budget.json'
+
+# Heavy dependencies each mode must not pull in
+FORBIDDEN_MODULES = {
+    'test-email': ('yt_dlp', 'schedule', 'src.playlist_monitor'),
+    'once': ('schedule',),
+    'monitor': (),
+    'history': ('yt_dlp', 'schedule', 'requests', 'src.playlist_monitor'),
+}
+
+# Imported at the start of the run itself rather than in setup()
+RUN_IMPORTS = {
+    'test-email': (),
+    'once': ('src.control', 'src.metrics'),
+    'monitor': ('schedule', 'src.metrics'),
+    'history': (),
+}
+
+# Enough configuration to pass validation, with nothing written into the repo
+ENVIRONMENT = {
+    'RESEND_API_KEY': 'benchmark-key',
+    'FROM_EMAIL': 'bench@example.com',
+    'TO_EMAIL': 'bench@example.com',
+    'PLAYLIST_URLS': 'https://www.youtube.com/playlist?list=PLBENCH',
+    'VERIFY_AVAILABILITY': 'false',
+    'SCHEDULE_MODE': 'fixed',
+}
+
+PROBE = """
+import sys
+sys.path.insert(0, {root!r})
+import main
+app = main.YouTubePlaylistMonitor()
+app.setup({mode!r})
+for module in {run_imports!r}:
+    __import__(module)
+if app.delivery:
+    app.delivery.close(timeout=0)
+"""
+
+def measure(mode: str, workdir: str) -> Tuple[float, List[str]]:
+    """Total import time (ms) of one cold start, and the modules it imported"""
+    env = {**os.environ, **ENVIRONMENT, 'PYTHONDONTWRITEBYTECODE': '1'}
+    env.pop('PYTHONPATH', None)
+    code = PROBE.format(root=str(ROOT), mode=mode, run_imports=RUN_IMPORTS[mode])
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise RuntimeError(f"{mode} failed to start")
+
+    total_us = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        if name.strip() == 'site':
+            # Interpreter startup, the same for every mode
+            total_us, modules = 0, []
+            continue
+        total_us += int(self_us)
+        modules.append(name.strip())
+    return total_us / 1000, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI cold-start benchmark")
+    parser.add_argument('--modes', type=lambda s: s.split(','), default=list(FORBIDDEN_MODULES),
+                        help='Comma-separated modes to measure')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--update-budget', action='store_true',
+                        help='Write the measured times (plus headroom) as the new budget')
+    parser.add_argument('--headroom', type=float, default=0.5,
+                        help='Budget headroom over the measured time when updating (0.5 = 50%%)')
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE, 'r') as f:
+        budget = json.load(f)
+
+    print("🧪 Benchmarking CLI startup")
+    print("=" * 50)
+
+    failures = []
+    measured: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes:
+            runs = [measure(mode, workdir) for _ in range(args.repeat)]
+            import_ms = statistics.median(ms for ms, _ in runs)
+            modules = set(runs[0][1])
+            measured[mode] = import_ms
+
+            limit = budget.get(mode, {}).get('import_ms')
+            status = f"budget {limit:g} ms" if limit else "no budget"
+            print(f"⏱️  {mode:<10} {import_ms:8.1f} ms of imports, {len(modules)} modules ({status})")
+
+            if limit and import_ms > limit:
+                failures.append(f"{mode}: {import_ms:.1f} ms of imports is over the {limit:g} ms budget")
+            for module in FORBIDDEN_MODULES.get(mode, ()):
+                if module in modules:
+                    failures.append(f"{mode}: imports {module}")
+
+    if args.update_budget:
+        for mode, import_ms in measured.items():
+            budget.setdefault(mode, {})['import_ms'] = round(import_ms * (1 + args.headroom))
+        with open(BUDGET_FILE, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        print(f"\n📝 Budget updated in {BUDGET_FILE.name}")
+        return
+
+    if failures:
+        print("\n❌ Startup regressions:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ Every mode starts within its budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the streaming scan pipeline
+
+Replays synthetic playlists (see replay.py) through an incremental full
+rescan, with each page of 100 entries taking `--page-ms` to arrive, and
+measures how soon the first change reaches the outbox compared to the whole
+scan, and how much memory the scan needs beyond the state it builds. Fails
+if the first change waits for the playlist to finish paging, or if the
+scan holds more than a fraction of that state again while it runs.
+    
+    uv run tests/benchmark_streaming.py
+    uv run tests/benchmark_streaming.py --sizes 1000,10000,100000 --page-ms 50
+"""
+
+import argparse
+import gc
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from replay import ReplayPlaylistMonitor, ReplaySession, load_fixture, synthetic_playlist
+from src.outbox import Outbox
+from src.state_store import JsonStateStore
+
+PAGE_SIZE = 100
+
+class PagedReplaySession(ReplaySession):
+    """Replay session whose entries arrive a page at a time"""
+    
+    def __init__(self, info: Dict, window_size: int, page_seconds: float):
+        super().__init__(info, window_size)
+        self.page_seconds = page_seconds
+    
+    def _timed_entries(self, entries):
+        for i, entry in enumerate(super()._timed_entries(entries)):
+            if i % PAGE_SIZE == 0:
+                time.sleep(self.page_seconds)
+            yield entry
+
+def run_scan(fixture: Dict, size: int, page_seconds: float) -> Dict[str, float]:
+    """Scan a playlist whose newest video just became free, after a baseline cycle"""
+    with tempfile.TemporaryDirectory() as tmp:
+        info = synthetic_playlist(fixture, size, playlist_id="PLSTREAM")
+        outbox = Outbox(str(Path(tmp) / "outbox.json"))
+        monitor = ReplayPlaylistMonitor(
+            "https://www.youtube.com/playlist?list=PLSTREAM", info,
+            scan_mode='incremental', full_rescan_hours=0,
+            state_store=JsonStateStore(str(Path(tmp) / "state.json")), outbox=outbox,
+        )
+        monitor.monitor_once()
+        
+        # The newest video that is still member-only goes free
+        entries = monitor.session.info['entries']
+        index = next(i for i, entry in enumerate(entries) if '限免' not in entry['title'])
+        entries[index] = dict(entries[index], title=f"【会员限免】{entries[index]['title']}")
+        monitor.session = PagedReplaySession(monitor.session.info, monitor.window_size, page_seconds)
+        previous_state = monitor.load_previous_state()
+        
+        first_change = []
+        add = outbox.add
+        def timed_add(changes, playlist_url=None):
+            first_change.append(time.perf_counter())
+            return add(changes, playlist_url)
+        outbox.add = timed_add
+        
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        current_state, changes, _ = monitor.scan_playlist(previous_state)
+        scan_seconds = time.perf_counter() - start
+        # What the scan keeps (the new state) versus what it needed on top of that
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        return {
+            'scan': scan_seconds,
+            'first_change': first_change[0] - start if first_change else scan_seconds,
+            'changes': len(changes),
+            'working_bytes': peak - retained,
+            'state_bytes': retained,
+            'videos': len(current_state['videos']),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming scan pipeline benchmark")
+    parser.add_argument('--sizes', default='1000,10000,50000', help='Comma-separated playlist sizes')
+    parser.add_argument('--page-ms', type=float, default=20, help='Simulated latency of each page of entries')
+    parser.add_argument('--max-first-change', type=float, default=0.2,
+                        help='Fail if the first change takes more than this fraction of the scan')
+    parser.add_argument('--max-working-ratio', type=float, default=0.5,
+                        help='Fail if the scan needs more than this fraction of the state on top of it')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    fixture = load_fixture()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    
+    print("🧪 Benchmarking the streaming scan pipeline (offline replay)")
+    print("=" * 50)
+    
+    results = {}
+    for size in sizes:
+        result = run_scan(fixture, size, args.page_ms / 1000)
+        results[size] = result
+        print(f"⏱️  size={size}: first change after {result['first_change'] * 1000:.0f} ms "
+              f"of a {result['scan'] * 1000:.0f} ms scan ({result['changes']} changes), "
+              f"working memory {result['working_bytes'] / 1024:.0f} KiB "
+              f"({result['working_bytes'] / result['state_bytes']:.0%} of the "
+              f"{result['state_bytes'] / 1024:.0f} KiB state)")
+    
+    failures = []
+    for size, result in results.items():
+        if result['first_change'] > args.max_first_change * result['scan']:
+            failures.append(f"size={size}: first change only after "
+                            f"{result['first_change'] / result['scan']:.0%} of the scan")
+        if result['working_bytes'] > args.max_working_ratio * result['state_bytes']:
+            failures.append(f"size={size}: working memory is "
+                            f"{result['working_bytes'] / result['state_bytes']:.0%} of the state")
+    
+    if failures:
+        print("\n❌ The scan stopped streaming:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ Changes are emitted while paging, without holding the playlist twice")
+
+if __name__ == "__main__":
+    main()
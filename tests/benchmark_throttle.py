@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the shared rate limiter
+
+Starts a local stand-in for YouTube that throttles any client going over
+`--threshold` requests in a sliding second (alternating HTTP 429 with a
+redirect to a /sorry/ captcha page), then has several workers - playlists
+polled from one host - fetch from it through yt-dlp sessions, first with no
+limit and then through the shared rate limiter starting well above the
+threshold. Fails if the limited run keeps getting throttled once it has
+settled, settles far below the threshold, or still swings between bursts
+and backoffs.
+    
+    uv run tests/benchmark_throttle.py
+    uv run tests/benchmark_throttle.py --threshold 50 --workers 16 --seconds 60
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yt_dlp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.throttle import HostThrottled, RateLimiter
+
+class StandInYouTubeServer(ThreadingHTTPServer):
+    """Local HTTP server that throttles above `threshold` requests per sliding second"""
+    
+    daemon_threads = True
+    
+    def __init__(self, threshold: int):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.threshold = threshold
+        self.recent = deque()
+        self.throttled = 0
+        self.ok_at: List[float] = []
+        self.throttled_at: List[float] = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, name="stand-in-youtube", daemon=True).start()
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+    
+    def admit(self) -> Optional[str]:
+        """Count a request; None if it is allowed, otherwise how it is throttled"""
+        with self._lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            # Throttled requests count too, so hammering keeps a client throttled
+            self.recent.append(now)
+            if len(self.recent) <= self.threshold:
+                self.ok_at.append(now)
+                return None
+            self.throttled += 1
+            self.throttled_at.append(now)
+            return 'captcha' if self.throttled % 2 else '429'
+    
+    def handle_error(self, request, client_address):
+        # Clients dropping connections mid-reply are expected here
+        pass
+    
+    def reset(self):
+        with self._lock:
+            self.recent.clear()
+            self.ok_at = []
+            self.throttled_at = []
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        if self.path.startswith('/sorry/'):
+            self._reply(200, b"<html>unusual traffic</html>")
+            return
+        
+        verdict = self.server.admit()
+        if verdict == '429':
+            self._reply(429, b"Too Many Requests", {'Retry-After': '1'})
+        elif verdict == 'captcha':
+            self.send_response(302)
+            self.send_header('Location', '/sorry/index')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._reply(200, b"{\"contents\": []}")
+    
+    def _reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def run(server: StandInYouTubeServer, workers: int, seconds: float, limiter: Optional[RateLimiter]):
+    """Fetch from the server in `workers` threads for `seconds`"""
+    server.reset()
+    stop = time.monotonic() + seconds
+    
+    def worker():
+        ydl = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True})
+        if limiter:
+            limiter.install(ydl)
+        while time.monotonic() < stop:
+            try:
+                ydl.urlopen(f"{server.url}/playlist").read()
+            except HostThrottled as e:
+                # What a monitor does: give up this cycle, try again on the next one
+                time.sleep(min(e.retry_in, max(0.0, stop - time.monotonic())))
+            except Exception:
+                pass
+        ydl.close()
+    
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return start
+
+def per_second(times: List[float], start: float, seconds: float) -> List[int]:
+    counts = [0] * int(seconds)
+    for at in times:
+        second = int(at - start)
+        if 0 <= second < len(counts):
+            counts[second] += 1
+    return counts
+
+def summarise(server: StandInYouTubeServer, start: float, seconds: float, label: str) -> Dict[str, float]:
+    ok = per_second(server.ok_at, start, seconds)
+    throttled = per_second(server.throttled_at, start, seconds)
+    # The second half, after the limiter has had time to settle
+    settled = slice(len(ok) // 2, len(ok))
+    result = {
+        'ok_per_second': statistics.fmean(ok[settled]),
+        'ok_spread': statistics.pstdev(ok[settled]) / max(statistics.fmean(ok[settled]), 1e-9),
+        'throttled': sum(throttled[settled]),
+        'requests': sum(ok[settled]) + sum(throttled[settled]),
+    }
+    print(f"⏱️  {label:<12} {result['ok_per_second']:6.1f} ok/s, "
+          f"{result['throttled']} of {result['requests']} requests throttled, "
+          f"spread {result['ok_spread']:.0%} (second half)")
+    print(f"   ok per second:        {' '.join(f'{n:3d}' for n in ok)}")
+    print(f"   throttled per second: {' '.join(f'{n:3d}' for n in throttled)}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared rate limiter benchmark")
+    parser.add_argument('--threshold', type=int, default=20, help='Requests per second the stand-in allows')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent fetching workers')
+    parser.add_argument('--seconds', type=float, default=30, help='Duration of each run')
+    parser.add_argument('--min-ok-ratio', type=float, default=0.6,
+                        help='Fail if the settled throughput is below this fraction of the threshold')
+    parser.add_argument('--max-throttled-ratio', type=float, default=0.05,
+                        help='Fail if more than this fraction of settled requests is throttled')
+    parser.add_argument('--max-spread', type=float, default=0.35,
+                        help='Fail if the settled throughput per second varies more than this (stdev / mean)')
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    server = StandInYouTubeServer(args.threshold)
+    host = '127.0.0.1'
+    
+    print("🧪 Benchmarking the shared rate limiter (local stand-in)")
+    print(f"   {args.workers} workers, stand-in throttles above {args.threshold} requests/s")
+    print("=" * 50)
+    
+    start = run(server, args.workers, args.seconds, None)
+    summarise(server, start, args.seconds, "unlimited")
+    
+    # Time constants scaled down from minutes to seconds, starting at twice the threshold
+    limiter = RateLimiter(rate_per_second=args.threshold * 2, burst=max(2, args.threshold // 4),
+                          backoff_seconds=0.5, max_backoff_seconds=8, max_wait_seconds=10,
+                          recovery_seconds=1.0)
+    start = run(server, args.workers, args.seconds, limiter)
+    limited = summarise(server, start, args.seconds, "limited")
+    state = limiter.snapshot()[host]
+    print(f"   settled at {state['rate_per_second']:.1f}/s under a learnt ceiling of "
+          f"{state['ceiling_per_second']:.1f}/s")
+    server.shutdown()
+    
+    failures = []
+    if limited['ok_per_second'] < args.min_ok_ratio * args.threshold:
+        failures.append(f"settled at {limited['ok_per_second']:.1f} ok/s, "
+                        f"under {args.min_ok_ratio:.0%} of the {args.threshold}/s threshold")
+    if limited['throttled'] > args.max_throttled_ratio * limited['requests']:
+        failures.append(f"{limited['throttled']} of {limited['requests']} settled requests were throttled")
+    if limited['ok_spread'] > args.max_spread:
+        failures.append(f"throughput still swings by {limited['ok_spread']:.0%} once settled")
+    
+    if failures:
+        print("\n❌ The limiter doesn't hold the rate under the threshold:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ Throughput settles just under the threshold without repeated throttling")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Offline replay of recorded yt-dlp playlist responses
+
+Record a live playlist response to a fixture:
+    uv run tests/replay.py record https://www.youtube.com/playlist?list=...
+
+Fixtures are replayed through PlaylistMonitor without touching YouTube,
+so the monitoring cycle can be measured reproducibly and in CI.
+"""
+
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.playlist_monitor import PlaylistMonitor
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+DEFAULT_FIXTURE = FIXTURES_DIR / "playlist_PLO_DkCSmTKMNMgr-JKMDV2Sw2HW59LMvc.json"
+
+def record_fixture(playlist_url: str, output: Optional[Path] = None) -> Path:
+    """Fetch a playlist with flat extraction and save the response as a fixture"""
+    import yt_dlp
+    
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(playlist_url, download=False))
+    
+    output = output or FIXTURES_DIR / f"playlist_{info['id']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    
+    print(f"💾 Recorded {len(info.get('entries') or [])} entries to {output}")
+    return output
+
+def load_fixture(path: Path = DEFAULT_FIXTURE) -> Dict:
+    """Load a recorded playlist response"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def synthetic_playlist(fixture: Dict, size: int, playlist_id: str = "PLSYNTHETIC",
+                       free_every: int = 7) -> Dict:
+    """Scale a recorded playlist up (or down) to `size` entries with unique ids"""
+    templates = fixture.get('entries') or []
+    entries = []
+    for i in range(size):
+        entry = copy.deepcopy(templates[i % len(templates)])
+        video_id = f"{playlist_id[-4:]}{i:07d}"
+        entry['id'] = video_id
+        entry['url'] = f"https://www.youtube.com/watch?v={video_id}"
+        title = entry.get('title') or ''
+        title = title.replace('限免', '')
+        entry['title'] = f"【会员限免】{title} #{i}" if i % free_every == 0 else f"{title} #{i}"
+        entries.append(entry)
+    
+    return dict(fixture, id=playlist_id, playlist_count=size, entries=entries)
+
+class ReplaySession:
+    """Stand-in for a yt_dlp.YoutubeDL session that serves a recorded response"""
+    
+    def __init__(self, info: Dict, window_size: int):
+        self.info = info
+        self.window_size = window_size
+        self.fetch_seconds = 0.0
+    
+    def _timed_entries(self, entries: List[Dict]):
+        for entry in entries:
+            start = time.perf_counter()
+            item = dict(entry)
+            self.fetch_seconds += time.perf_counter() - start
+            yield item
+    
+    def extract_info(self, url: str, download: bool = False, process: bool = True) -> Dict:
+        start = time.perf_counter()
+        info = {k: v for k, v in self.info.items() if k != 'entries'}
+        entries = self.info.get('entries') or []
+        if process:
+            # Processing resolves every entry up front
+            info['entries'] = [dict(entry) for entry in entries]
+        else:
+            info['entries'] = self._timed_entries(entries)
+        self.fetch_seconds += time.perf_counter() - start
+        return info
+    
+    def close(self):
+        pass
+
+class ReplayPlaylistMonitor(PlaylistMonitor):
+    """PlaylistMonitor whose yt-dlp session replays a recorded playlist"""
+    
+    def __init__(self, playlist_url: str, info: Dict, **kwargs):
+        super().__init__(playlist_url, **kwargs)
+        self.session = ReplaySession(info, self.window_size)
+    
+    def _get_session(self) -> ReplaySession:
+        return self.session
+    
+    def close_session(self):
+        pass
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'record':
+        print("Usage: uv run tests/replay.py record <playlist_url>")
+        sys.exit(1)
+    record_fixture(sys.argv[2])
@@ -40,15 +40,15 @@ def test_monitor():
     member_count = 0
     
     for i, video in enumerate(playlist_data['videos'], 1):
-        status = "🔓 FREE" if not video['is_member_only'] else "🔒 MEMBER-ONLY"
-        has_free_indicator = "✅" if '限免' in video['title'] else "❌"
+        status = "🔓 FREE" if not video.is_member_only else "🔒 MEMBER-ONLY"
+        has_free_indicator = "✅" if '限免' in video.title else "❌"
         
-        print(f"{i}. {video['title'][:60]}...")
+        print(f"{i}. {video.title[:60]}...")
         print(f"   Status: {status}")
         print(f"   Has '限免': {has_free_indicator}")
         print()
         
-        if video['is_member_only']:
+        if video.is_member_only:
             member_count += 1
         else:
             free_count += 1
@@ -4,6 +4,7 @@ Test the simplified logic - title-only detection
 """
 
 from src.playlist_monitor import PlaylistMonitor
+from src.records import state_to_dict
 import json
 
 def test_simplified_logic():
@@ -22,15 +23,15 @@ def test_simplified_logic():
         print("\n📊 Video Analysis:")
         
         for video in playlist_data['videos']:
-            print(f"\n🎥 Video {video['position']}: {video['title']}")
-            print(f"   ID: {video['id']}")
-            print(f"   Status: {'🔓 FREE' if not video['is_member_only'] else '🔒 MEMBER-ONLY'}")
-            print(f"   Availability: {video['availability']}")
+            print(f"\n🎥 Video {video.position}: {video.title}")
+            print(f"   ID: {video.id}")
+            print(f"   Status: {'🔓 FREE' if not video.is_member_only else '🔒 MEMBER-ONLY'}")
+            print(f"   Availability: {video.availability}")
             print(f"   Detection method: Title parsing only")
             
             # Check logic
-            has_limited_free = '限免' in video['title']
-            detected_as_free = not video['is_member_only']
+            has_limited_free = '限免' in video.title
+            detected_as_free = not video.is_member_only
             
             if has_limited_free == detected_as_free:
                 print(f"   🎯 LOGIC: ✅ Correct")
@@ -39,15 +40,15 @@ def test_simplified_logic():
         
         # Save results
         with open('simplified_results.json', 'w') as f:
-            json.dump(playlist_data, f, indent=2, ensure_ascii=False)
+            json.dump(state_to_dict(playlist_data), f, indent=2, ensure_ascii=False)
         
         print(f"\n💾 Results saved to simplified_results.json")
         
         # Summary
         total_videos = len(playlist_data['videos'])
-        free_videos = sum(1 for v in playlist_data['videos'] if not v['is_member_only'])
+        free_videos = sum(1 for v in playlist_data['videos'] if not v.is_member_only)
         member_videos = total_videos - free_videos
-        limited_free_count = sum(1 for v in playlist_data['videos'] if '限免' in v['title'])
+        limited_free_count = sum(1 for v in playlist_data['videos'] if '限免' in v.title)
         
         print(f"\n📈 SUMMARY:")
         print(f"   Total videos: {total_videos}")
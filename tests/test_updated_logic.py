@@ -4,6 +4,7 @@ Test the updated detection logic with '限免' title parsing
 """
 
 from src.playlist_monitor import PlaylistMonitor
+from src.records import state_to_dict
 import json
 
 def test_updated_logic():
@@ -21,15 +22,15 @@ def test_updated_logic():
         print("\n📊 Video Analysis:")
         
         for video in playlist_data['videos']:
-            print(f"\n🎥 Video {video['position']}: {video['title']}")
-            print(f"   ID: {video['id']}")
-            print(f"   Status: {'🔓 FREE' if not video['is_member_only'] else '🔒 MEMBER-ONLY'}")
-            print(f"   Availability: {video['availability']}")
-            print(f"   Title contains '限免': {'✅' if '限免' in video['title'] else '❌'}")
+            print(f"\n🎥 Video {video.position}: {video.title}")
+            print(f"   ID: {video.id}")
+            print(f"   Status: {'🔓 FREE' if not video.is_member_only else '🔒 MEMBER-ONLY'}")
+            print(f"   Availability: {video.availability}")
+            print(f"   Title contains '限免': {'✅' if '限免' in video.title else '❌'}")
             
             # Check if logic worked correctly
-            has_limited_free = '限免' in video['title']
-            detected_as_free = not video['is_member_only']
+            has_limited_free = '限免' in video.title
+            detected_as_free = not video.is_member_only
             
             if has_limited_free and detected_as_free:
                 print(f"   🎯 LOGIC: ✅ Correctly detected as free from title")
@@ -42,13 +43,13 @@ def test_updated_logic():
         
         # Save for manual inspection
         with open('test_detection_results.json', 'w') as f:
-            json.dump(playlist_data, f, indent=2, ensure_ascii=False)
+            json.dump(state_to_dict(playlist_data), f, indent=2, ensure_ascii=False)
         
         print(f"\n💾 Results saved to test_detection_results.json")
         
         # Summary
         total_videos = len(playlist_data['videos'])
-        free_videos = sum(1 for v in playlist_data['videos'] if not v['is_member_only'])
+        free_videos = sum(1 for v in playlist_data['videos'] if not v.is_member_only)
         member_videos = total_videos - free_videos
         
         print(f"\n📈 SUMMARY:")
@@ -57,7 +58,7 @@ def test_updated_logic():
         print(f"   🔒 Member-only videos: {member_videos}")
         
         # Check for '限免' detection
-        limited_free_count = sum(1 for v in playlist_data['videos'] if '限免' in v['title'])
+        limited_free_count = sum(1 for v in playlist_data['videos'] if '限免' in v.title)
         print(f"   🎯 Videos with '限免' in title: {limited_free_count}")
         
         return True